@@ -1,18 +1,10 @@
 from typing import List, Dict, Union
 
-import openai
-import os
-from dotenv import load_dotenv
+from config import settings
+from services.openai_gateway import openai_gateway
 
-# Load environment variables from .env
-load_dotenv()
-
-# Set Azure OpenAI configurations
-openai.api_base = os.getenv("AZURE_OPENAI_ENDPOINT")
-openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-openai.api_type = "azure"
-openai.api_version = "2023-05-15"  # Use your current Azure API version
-DEFAULT_DEPLOYMENT = "rabbit"
+# Endpoint, API key and API version live in Settings; calls go through the shared gateway
+DEFAULT_DEPLOYMENT = settings.POLICY_DEPLOYMENT_NAME
 
 SYSTEM_PROMPT = """
 You are an insurance‑policy compliance assistant. 
@@ -42,13 +34,7 @@ async def query_openai(prompt: str, max_tokens: int = 100, temperature: float =
         str: The response text from OpenAI.
     """
     try:
-        response = openai.Completion.create(
-            engine="your-deployment-name",  # Specify your deployment name
-            prompt=prompt,
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-        return response.choices[0].text.strip()
+        return await openai_gateway.complete(prompt, max_tokens=max_tokens, temperature=temperature)
     except Exception as e:
         raise RuntimeError(f"Failed to get response from OpenAI: {e}")
 
@@ -64,17 +50,9 @@ async def secondary_query_openai(
     • prompt = str  → wrapped as one user message
     • prompt = list → treated as full chat history
     """
-    messages = (
-        [{"role": "user", "content": prompt}]
-        if isinstance(prompt, str)
-        else prompt
-    )
-
-    resp = await openai.ChatCompletion.acreate(
-        engine=deployment or DEFAULT_DEPLOYMENT,
-        messages=messages,
+    return await openai_gateway.complete(
+        prompt,
         max_tokens=max_tokens,
         temperature=temperature,
-        n=1,
+        deployment=deployment or DEFAULT_DEPLOYMENT,
     )
-    return resp.choices[0].message.content.strip()
\ No newline at end of file
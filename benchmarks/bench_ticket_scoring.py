@@ -0,0 +1,218 @@
+"""
+Benchmark: the original per-ticket assign_ticket_weights vs. columnar NumPy
+scoring with heap top-k (ticket_scoring.rank_tickets).
+
+Runs on synthetic tickets (no database or webhook needed) and checks that both
+produce the same weights, the same top-k order and the same SLA results for
+the returned tickets.
+
+    python -m benchmarks.bench_ticket_scoring --tickets 5000 --top 5
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+from zoneinfo import ZoneInfo
+
+from ticket_handling.ticket_scoring import STATUS_WEIGHTS, SLA_FIELDS, rank_tickets, score_tickets
+
+
+def iso(value):
+    """Autotask-style timestamp, sometimes with 7 fractional digits."""
+    if value is None:
+        return None
+    text = value.strftime("%Y-%m-%dT%H:%M:%S")
+    return text + (f".{random.randint(0, 9_999_999):07d}Z" if random.random() < 0.5 else "Z")
+
+
+def synthetic_tickets(count: int):
+    now = datetime.now(timezone.utc)
+    statuses = list(STATUS_WEIGHTS) + [99, None]
+    for i in range(count):
+        # Whole days plus 1-23 hours, so no ticket's age crosses a day boundary between the two runs
+        created = now - timedelta(days=random.randint(0, 89), hours=random.uniform(1, 23))
+        ticket = {
+            "id": 1_000_000 + i,
+            "title": f"Synthetic ticket {i}",
+            "priority": random.choice([1, 2, 3, 4, 5, None]),
+            "status": random.choice(statuses),
+            "createDate": iso(created) if random.random() > 0.02 else "not a date",
+        }
+        for met_field, due_field, _ in SLA_FIELDS:
+            due = created + timedelta(hours=random.uniform(1, 72)) if random.random() > 0.1 else None
+            met = created + timedelta(hours=random.uniform(0, 96)) if random.random() > 0.4 else None
+            ticket[due_field] = iso(due)
+            ticket[met_field] = iso(met)
+        yield ticket
+
+
+# check_sla from inside the original assign_ticket_weights below, copied verbatim at module level
+# so the benchmark can check rank_tickets' sla_results against it
+async def check_sla(met_date_str, due_date_str):
+    cst_tz = ZoneInfo('America/Chicago')
+
+    try:
+        # Parse due_date_str
+        due_date = datetime.fromisoformat(due_date_str.replace("Z", "+00:00")).astimezone(cst_tz) if due_date_str else None
+        met_date = datetime.fromisoformat(met_date_str.replace("Z", "+00:00")).astimezone(cst_tz) if met_date_str else None
+
+        logging.debug(f"[check_sla] due_date: {due_date}, met_date: {met_date}")
+
+    except ValueError as e:
+        logging.error(f"[check_sla] Invalid datetime format: {e}")
+        return False, None, "N/A", "Not completed"
+
+    sla_met = False
+    time_diff_seconds = None
+
+    if due_date:
+        if met_date:
+            sla_met = met_date <= due_date
+            time_diff_seconds = (due_date - met_date).total_seconds()
+        else:
+            sla_met = False
+            now = datetime.now(cst_tz)
+            time_diff_seconds = (due_date - now).total_seconds()
+    else:
+        logging.debug("[check_sla] Due date is None, returning N/A for SLA calculation.")
+        return False, None, "N/A", "Not completed"
+
+    return sla_met, time_diff_seconds, due_date.strftime("%m-%d-%y %-I:%M %p %Z") if due_date else "N/A", met_date.strftime("%m-%d-%y %-I:%M %p %Z") if met_date else "Not completed"
+
+
+# The previous implementation, copied verbatim from ticket_handling/main_ticket_handler.py
+async def assign_ticket_weights(tickets: List[dict]) -> List[dict]:
+    logging.info(f"[assign_ticket_weights] Processing {len(tickets)} tickets for weight assignment.")
+
+    async def check_sla(met_date_str, due_date_str):
+        cst_tz = ZoneInfo('America/Chicago')
+
+        try:
+            # Parse due_date_str
+            due_date = datetime.fromisoformat(due_date_str.replace("Z", "+00:00")).astimezone(cst_tz) if due_date_str else None
+            met_date = datetime.fromisoformat(met_date_str.replace("Z", "+00:00")).astimezone(cst_tz) if met_date_str else None
+
+            logging.debug(f"[check_sla] due_date: {due_date}, met_date: {met_date}")
+
+        except ValueError as e:
+            logging.error(f"[check_sla] Invalid datetime format: {e}")
+            return False, None, "N/A", "Not completed"
+
+        sla_met = False
+        time_diff_seconds = None
+
+        if due_date:
+            if met_date:
+                sla_met = met_date <= due_date
+                time_diff_seconds = (due_date - met_date).total_seconds()
+            else:
+                sla_met = False
+                now = datetime.now(cst_tz)
+                time_diff_seconds = (due_date - now).total_seconds()
+        else:
+            logging.debug("[check_sla] Due date is None, returning N/A for SLA calculation.")
+            return False, None, "N/A", "Not completed"
+
+        return sla_met, time_diff_seconds, due_date.strftime("%m-%d-%y %-I:%M %p %Z") if due_date else "N/A", met_date.strftime("%m-%d-%y %-I:%M %p %Z") if met_date else "Not completed"
+
+    async def calculate_weight(ticket):
+        try:
+            weight = 0
+            ticket_id = ticket.get("id", "Unknown")
+            logging.debug(f"[calculate_weight] Calculating weight for Ticket ID: {ticket_id}")
+
+            priority = ticket.get("priority", "N/A")
+            status = ticket.get("status", "N/A")
+
+            priority_weights = {1: 5, 2: 4, 3: 3, 4: 2, 5: 1}
+            status_weights = {1: 50, 5: -10, 7: -20, 11: 70, 21: 60, 24: 65, 28: 55, 29: 60, 32: 0, 36: 65, 41: -20, 54: 60, 56: 60, 64: -20, 70: 70, 71: 70, 74: -20, 38: -400}
+
+            weight += priority_weights.get(priority, 0)
+            weight += status_weights.get(status, 10)
+
+            sla_fields = [("firstResponseDateTime", "firstResponseDueDateTime", "First Response"),
+                          ("resolutionPlanDateTime", "resolutionPlanDueDateTime", "Resolution Plan"),
+                          ("resolvedDateTime", "resolvedDueDateTime", "Resolution")]
+
+            for met_field, due_field, sla_name in sla_fields:
+                met_date_str = ticket.get(met_field)
+                due_date_str = ticket.get(due_field)
+                logging.debug(f"[calculate_weight] SLA Field {sla_name}: met_date={met_date_str}, due_date={due_date_str}")
+
+                sla_met, time_diff_seconds, due_date_formatted, met_date_formatted = await check_sla(met_date_str, due_date_str)
+                logging.debug(f"[calculate_weight] SLA {sla_name}: Met={sla_met}, Due={due_date_formatted}, Met={met_date_formatted}")
+
+                if not sla_met:
+                    weight += 100  # Penalize for unmet SLA
+
+            create_date_str = ticket.get("createDate")
+            if create_date_str:
+                try:
+                    create_date = datetime.fromisoformat(create_date_str.replace("Z", "+00:00"))
+                    days_since_creation = (datetime.now(timezone.utc) - create_date).days
+                    weight += days_since_creation * 10
+                    logging.debug(f"[calculate_weight] Ticket {ticket_id} Age: {days_since_creation} days, Final Weight: {weight}")
+                except ValueError:
+                    logging.error(f"[calculate_weight] Invalid createDate format: {create_date_str}")
+
+            return weight
+
+        except Exception as e:
+            logging.critical(f"[calculate_weight] Unexpected error for Ticket ID: {ticket_id} - {e}", exc_info=True)
+            return 0  # Default weight in case of failure
+
+    for ticket in tickets:
+        ticket["weight"] = await calculate_weight(ticket)
+
+    sorted_tickets = sorted(tickets, key=lambda t: t["weight"], reverse=True)
+    logging.info(f"[assign_ticket_weights] Top Ticket ID: {sorted_tickets[0]['id']} Weight: {sorted_tickets[0]['weight']}")
+    return sorted_tickets[:1]
+
+
+def timed(label, fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<22} {best * 1000:9.2f} ms  {len(args[0]) / best:12.0f} tickets/s")
+    return best, result
+
+
+def run_original(tickets):
+    return asyncio.run(assign_ticket_weights(tickets))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=5000)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)  # Time the scoring, not log output (the original logs per ticket)
+
+    tickets = list(synthetic_tickets(args.tickets))
+    original = [dict(t) for t in tickets]
+    original_top = run_original(original)
+    original_weights = [t["weight"] for t in original]
+    assert score_tickets(tickets).tolist() == original_weights, "weights differ from assign_ticket_weights"
+    expected = [t["id"] for t in sorted(original, key=lambda t: t["weight"], reverse=True)[:args.top]]
+    ranked = rank_tickets([dict(t) for t in tickets], args.top)
+    assert [t["id"] for t in ranked] == expected and ranked[0]["id"] == original_top[0]["id"], "top-k order differs"
+    for ticket in ranked:
+        for (met_field, due_field, _), sla in zip(SLA_FIELDS, ticket["sla_results"]):
+            sla_met, _, due_date_formatted, met_date_formatted = asyncio.run(check_sla(ticket[met_field], ticket[due_field]))
+            assert (sla["sla_met"], sla["due_date_formatted"], sla["met_date_formatted"]) == \
+                (sla_met, due_date_formatted, met_date_formatted), f"SLA results differ for ticket {ticket['id']}"
+
+    print(f"Benchmarking {len(tickets)} tickets (top {args.top})")
+    legacy, _ = timed("assign_ticket_weights", run_original, [dict(t) for t in tickets])
+    fast, _ = timed("rank_tickets", rank_tickets, [dict(t) for t in tickets], args.top)
+    print(f"speedup: {legacy / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
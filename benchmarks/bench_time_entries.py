@@ -0,0 +1,106 @@
+"""
+Benchmark: row-at-a-time MERGE loop vs. staging-table bulk MERGE for time entries.
+
+Runs against the configured secondary database, on a scratch copy of
+dbo.TimeEntries (dbo.TimeEntries_bench) that is dropped afterwards.
+
+    python -m benchmarks.bench_time_entries --rows 20000 --batch-size 1000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from config import secondary_sync_engine
+from services.bulk_upsert import merge_batch, chunked
+from services.ingestion import TIME_ENTRY_COLUMNS, map_time_entries
+
+BENCH_TABLE = "dbo.TimeEntries_bench"
+
+
+def synthetic_entries(count: int, id_offset: int = 900_000_000):
+    base = datetime(2025, 1, 1)
+    for i in range(count):
+        start = base + timedelta(minutes=15 * i)
+        yield {
+            "id": id_offset + i,
+            "contractID": random.choice([None, 1001, 1002]),
+            "createDateTime": start.isoformat() + "Z",
+            "creatorUserID": 29682885,
+            "dateWorked": start.date().isoformat() + "T00:00:00Z",
+            "endDateTime": (start + timedelta(minutes=30)).isoformat() + "Z",
+            "hoursToBill": 0.5,
+            "hoursWorked": 0.5,
+            "internalNotes": "bench " * 20,
+            "isNonBillable": False,
+            "lastModifiedDateTime": start.isoformat() + "Z",
+            "resourceID": 29682885,
+            "roleID": 29683461,
+            "startDateTime": start.isoformat() + "Z",
+            "summaryNotes": "Synthetic benchmark time entry. " * 10,
+            "ticketID": 12345,
+            "timeEntryType": 2,
+        }
+
+
+def row_at_a_time(rows):
+    """The previous implementation: one MERGE and one commit per row."""
+    params = ", ".join(f":{c} AS {c}" for c in TIME_ENTRY_COLUMNS)
+    updates = ", ".join(f"{c} = source.{c}" for c in TIME_ENTRY_COLUMNS if c != "id")
+    query = text(f"""
+        MERGE INTO {BENCH_TABLE} AS target
+        USING (SELECT {params}) AS source
+        ON target.id = source.id
+        WHEN MATCHED THEN UPDATE SET {updates}
+        WHEN NOT MATCHED THEN
+            INSERT ({", ".join(TIME_ENTRY_COLUMNS)})
+            VALUES ({", ".join("source." + c for c in TIME_ENTRY_COLUMNS)});
+    """)
+    with secondary_sync_engine.connect() as conn:
+        for row in rows:
+            conn.execute(query, row)
+            conn.commit()
+
+
+def bulk(rows, batch_size):
+    for batch in chunked(rows, batch_size):
+        merge_batch(BENCH_TABLE, "id", TIME_ENTRY_COLUMNS, batch)
+
+
+def reset_table():
+    with secondary_sync_engine.begin() as conn:
+        conn.execute(text(f"IF OBJECT_ID('{BENCH_TABLE}') IS NOT NULL DROP TABLE {BENCH_TABLE}"))
+        conn.execute(text(f"SELECT TOP 0 * INTO {BENCH_TABLE} FROM dbo.TimeEntries"))
+
+
+def timed(label, fn, *args):
+    reset_table()
+    started = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<16} {elapsed:9.2f}s  {len(args[0]) / elapsed:10.1f} rows/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    rows, _ = map_time_entries(list(synthetic_entries(args.rows)))
+    print(f"Benchmarking {len(rows)} time entries (batch size {args.batch_size})")
+    try:
+        legacy = timed("row-at-a-time", row_at_a_time, rows)
+        fast = timed("bulk MERGE", bulk, rows, args.batch_size)
+        print(f"speedup: {legacy / fast:.1f}x")
+    finally:
+        with secondary_sync_engine.begin() as conn:
+            conn.execute(text(f"IF OBJECT_ID('{BENCH_TABLE}') IS NOT NULL DROP TABLE {BENCH_TABLE}"))
+
+
+if __name__ == "__main__":
+    main()
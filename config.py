@@ -1,4 +1,5 @@
 import logging
+from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from contextlib import asynccontextmanager
@@ -35,6 +36,15 @@ SECONDARY_DATABASE_URL = (
     f"mssql+aioodbc://{settings.DB_SECONDARY_USER}:{settings.DB_SECONDARY_PASSWORD}@{settings.DB_SERVER}/{settings.DB_SECONDARY_NAME}"
     "?driver=ODBC+Driver+18+for+SQL+Server&TrustServerCertificate=yes"
 )
+# Sync pyodbc URL for bulk ingest (fast_executemany is only available on the sync driver)
+SECONDARY_SYNC_DATABASE_URL = (
+    f"mssql+pyodbc://{settings.DB_SECONDARY_USER}:{settings.DB_SECONDARY_PASSWORD}@{settings.DB_SERVER}/{settings.DB_SECONDARY_NAME}"
+    "?driver=ODBC+Driver+18+for+SQL+Server&TrustServerCertificate=yes"
+)
+
+# Bulk ingest tuning
+INGEST_BATCH_SIZE = settings.INGEST_BATCH_SIZE
+MAX_BODY_SIZE = 900_000_000  # Largest accepted request body (also enforced while streaming uploads)
 
 # Create Async Engines
 async_engine = create_async_engine(
@@ -46,6 +56,14 @@ secondary_async_engine = create_async_engine(
     echo=False
 )
 
+# Sync engine used by the bulk upsert engine; callers run it via asyncio.to_thread
+secondary_sync_engine = create_engine(
+    SECONDARY_SYNC_DATABASE_URL,
+    fast_executemany=True,
+    pool_pre_ping=True,
+    echo=False
+)
+
 # Create async session makers
 AsyncSessionLocal = sessionmaker(
     async_engine, expire_on_commit=False, class_=AsyncSession
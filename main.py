@@ -1,29 +1,45 @@
+import asyncio
 import base64
+import hashlib
 import json
-from datetime import datetime
+import time
 from typing import List, Dict, Optional
 import jwt
-import pdfplumber
-from jwt import PyJWKClient
-import httpx
 from fastapi import FastAPI, Depends, HTTPException, Request, BackgroundTasks
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy import text
-from config import OPENID_CONFIG_URL, APP_ID, get_db_connection, get_secondary_db_connection
+from config import settings, INGEST_BATCH_SIZE, MAX_BODY_SIZE, get_db_connection
 from models.models import DeviceData
 from security.auth import get_api_key
+from security.teams_keys import teams_key_store
+from services.http_clients import http_clients
 import logging
 from starlette.middleware.base import BaseHTTPMiddleware
-from services.ai_processing import generate_recommendations, handle_sendtoai
-from services.bot_actions import send_message_to_teams, get_bot_token
-from services.data_processing import generate_analytics, run_pipeline, download_teams_file
+from services.ai_processing import generate_recommendations, handle_sendtoai, format_ai_response
+from services.openai_gateway import openai_gateway
+from services.rate_limiter import openai_rate_limiter
+from services.llm_cache import llm_cache
+from services.tokens import load_encoding, tokenizer_metrics
+from services.bot_actions import send_message_to_teams, update_teams_message, get_bot_token, bot_token_manager
+from services.data_processing import generate_analytics, run_pipeline, download_teams_file, update_contract_summary
 from services.pdf_service import generate_pdf_report
+from services.pdf_extraction import extract_pdf_text, pdf_extractor
+from services.ingestion import ingest_time_entries, ingest_contract_units, ingest_contracts, ingest_tickets
+from services.change_detection import row_hash_index
+from services.timestamps import parse_timestamp_column
+from services.job_queue import job_queue, JobProgress, QueueFullError
+from services.json_stream import aiter_batches
+from services.content_encoding import BodyDecoder, UnsupportedEncodingError, DecompressedTooLargeError, \
+    InvalidEncodedBodyError
 import uuid
 import os
 
 from services.pipelines import start_kpi_background_update, Session
-from ticket_handling.main_ticket_handler import fetch_tickets_from_webhook, assign_ticket_weights, construct_ticket_card
-from fastapi import Body
+from ticket_handling.main_ticket_handler import construct_ticket_card
+from ticket_handling.ticket_cache import ticket_cache
+from ticket_handling.ticket_source import ticket_source
+from ticket_handling.ticket_queues import ticket_queues
+from fastapi import Body, Query
 
 
 # Define the Middleware Class
@@ -41,7 +57,7 @@ class MaxBodySizeMiddleware(BaseHTTPMiddleware):
 
 app = FastAPI()
 logging.basicConfig(filename="/var/www/rabbitai/rabbitai.log", level=logging.INFO)
-app.add_middleware(MaxBodySizeMiddleware, max_body_size=900_000_000)  # 100 MB
+app.add_middleware(MaxBodySizeMiddleware, max_body_size=MAX_BODY_SIZE)
 
 
 def decode_jwt(token):
@@ -60,27 +76,9 @@ async def validate_teams_token(auth_header: str):
 
     token = auth_header.split(" ")[1]
 
-    # Fetch OpenID configuration
-    async with httpx.AsyncClient() as client:
-        response = await client.get(OPENID_CONFIG_URL)
-        response.raise_for_status()
-        openid_config = response.json()
-
-    jwks_uri = openid_config["jwks_uri"]
-
-    # Fetch JWKS
-    jwk_client = PyJWKClient(jwks_uri)
-    signing_key = jwk_client.get_signing_key_from_jwt(token)
-
-    # Validate token
+    # Signing keys and already-verified tokens are cached process-wide; see security/teams_keys.py
     try:
-        decoded_token = jwt.decode(
-            token,
-            signing_key.key,
-            algorithms=["RS256"],
-            audience=APP_ID,
-            issuer="https://api.botframework.com"
-        )
+        decoded_token = await teams_key_store.validate(token)
         logging.info(f"Token successfully validated. Decoded token: {decoded_token}")
         return decoded_token
     except jwt.InvalidTokenError as e:
@@ -109,18 +107,7 @@ async def count_tickets(request: Request):
         raise HTTPException(status_code=500, detail="Error processing JSON data")
 
 
-async def calculate_resolution_time(create_date: Optional[str], resolved_date: Optional[str]):
-    if not create_date or not resolved_date:
-        return None
-    try:
-        start = datetime.fromisoformat(create_date.rstrip("Z"))  # Handle 'Z'
-        end = datetime.fromisoformat(resolved_date.rstrip("Z"))
-        return (end - start).total_seconds() / 3600
-    except ValueError:
-        return None
-
-
-async def check_sla_met(ticket):
+def check_sla_met(ticket):
     return ticket.get("serviceLevelAgreementHasBeenMet") is True
 
 
@@ -143,9 +130,6 @@ async def ticket_stats(request: Request):
             "sub_issue_type_count": {}
         }
 
-        total_resolution_time = 0
-        resolved_tickets_count = 0
-
         for ticket in tickets:
             company_id = ticket.get("companyID")
             contact_id = ticket.get("contactID")
@@ -160,22 +144,18 @@ async def ticket_stats(request: Request):
             if priority in stats["priority_count"]:
                 stats["priority_count"][priority] += 1
 
-            create_date = ticket.get("createDate")
-            resolved_date = ticket.get("resolvedDateTime")
-            resolution_time = calculate_resolution_time(create_date, resolved_date)
-
-            if resolution_time is not None:
-                total_resolution_time += resolution_time
-                resolved_tickets_count += 1
-
             issue_type = ticket.get("issueType")
             sub_issue_type = ticket.get("subIssueType")
 
             stats["issue_type_count"][issue_type] = stats["issue_type_count"].get(issue_type, 0) + 1
             stats["sub_issue_type_count"][sub_issue_type] = stats["sub_issue_type_count"].get(sub_issue_type, 0) + 1
 
-        if resolved_tickets_count > 0:
-            stats["average_resolution_time"] = total_resolution_time / resolved_tickets_count
+        # Resolution time in hours, parsed column-wise; unresolved or unparseable tickets drop out as NaT
+        created = parse_timestamp_column(ticket.get("createDate") for ticket in tickets)
+        resolved = parse_timestamp_column(ticket.get("resolvedDateTime") for ticket in tickets)
+        resolution_hours = ((resolved - created).dt.total_seconds() / 3600).dropna()
+        if not resolution_hours.empty:
+            stats["average_resolution_time"] = float(resolution_hours.mean())
 
         return stats
 
@@ -274,8 +254,83 @@ async def download_report(filename: str):
     })
 
 
+def askrabbit_card(question: str, answer: str) -> dict:
+    return {
+        "type": "AdaptiveCard",
+        "version": "1.2",
+        "body": [
+            {"type": "TextBlock", "text": "**Rabbit AI Response**", "wrap": True, "weight": "Bolder", "size": "Medium"},
+            {"type": "TextBlock", "text": f"**Question:** {question}", "wrap": True, "weight": "Bolder"},
+            {"type": "TextBlock", "text": f"**Answer:**\n\n{answer}", "wrap": True}
+        ]
+    }
+
+
+async def log_askrabbit(aad_object_id: str, args: str, response_text: str):
+    try:
+        async with get_db_connection() as conn:  # ✅ FIXED: Use `async with` instead of `async for`
+            async with conn.begin():
+                await conn.execute(
+                    text(
+                        "INSERT INTO CommandLogs (aadObjectId, command, command_data, result_data) "
+                        "VALUES (:aadObjectId, :command, :command_data, :result_data)"
+                    ),
+                    {
+                        "aadObjectId": aad_object_id,
+                        "command": "askRabbit",
+                        "command_data": json.dumps({"message": args}),
+                        "result_data": json.dumps({"response": response_text}),
+                    },
+                )
+                logging.info("✅ `askRabbit` command logged successfully!")
+    except Exception as e:
+        logging.error(f"❌ Failed to log 'askRabbit' command to database: {e}", exc_info=True)
+
+
+async def stream_askrabbit_answer(service_url: str, conversation_id: str, aad_object_id: str,
+                                  activity_id: Optional[str], args: str):
+    """
+    Background half of a streamed askRabbit: streams the completion and updates the placeholder
+    card in place, at most once per ASKRABBIT_UPDATE_INTERVAL_SECONDS and one update in flight.
+    The final card gets the same code-block formatting as the non-streamed reply.
+    """
+    answer, last_update, pending = "", 0.0, None
+
+    async def push(card: dict):
+        try:
+            await update_teams_message(service_url, conversation_id, activity_id, aad_object_id, card)
+        except Exception as e:
+            logging.warning(f"⚠️ Progressive askRabbit update failed: {e}")
+
+    try:
+        async for delta in openai_gateway.stream_chat(args, max_tokens=4096, temperature=0.7):
+            answer += delta
+            now = time.monotonic()
+            if activity_id and now - last_update >= settings.ASKRABBIT_UPDATE_INTERVAL_SECONDS \
+                    and (pending is None or pending.done()):
+                last_update = now
+                pending = asyncio.create_task(push(askrabbit_card(args, answer + " ▌")))
+        response_text = " ".join(block["text"] for block in format_ai_response(answer.strip()))
+    except Exception as e:
+        logging.error(f"❌ Streaming askRabbit answer failed: {e}", exc_info=True)
+        response_text = f"Error communicating with OpenAI: {e}"
+
+    if pending is not None:
+        await pending  # Keep the final card from being overwritten by a late partial update
+    card = askrabbit_card(args, response_text)
+    try:
+        if activity_id:
+            await update_teams_message(service_url, conversation_id, activity_id, aad_object_id, card)
+        else:
+            await send_message_to_teams(service_url, conversation_id, aad_object_id, card)
+        logging.info("📩 Streamed AI response completed in Teams!")
+    except Exception as e:
+        logging.error(f"❌ Failed to deliver final askRabbit answer: {e}", exc_info=True)
+    await log_askrabbit(aad_object_id, args, response_text)
+
+
 @app.post("/command")
-async def handle_command(request: Request):
+async def handle_command(request: Request, background_tasks: BackgroundTasks):
     """Handles commands from Microsoft Teams."""
     logging.info("🚀 Received a command request from Teams.")
 
@@ -306,6 +361,15 @@ async def handle_command(request: Request):
             args = command_text[len("askrabbit"):].strip()
             logging.info(f"🤖 Processing `askRabbit` command with args: {args}")
 
+            if settings.ASKRABBIT_STREAMING and args:
+                # Acknowledge within a second with a placeholder, then fill it in after the response is sent
+                placeholder = await send_message_to_teams(service_url, conversation_id, aad_object_id,
+                                                          askrabbit_card(args, "⏳ Thinking..."))
+                activity_id = placeholder.get("id") if isinstance(placeholder, dict) else None
+                background_tasks.add_task(stream_askrabbit_answer, service_url, conversation_id,
+                                          aad_object_id, activity_id, args)
+                return {"status": "streaming", "activity_id": activity_id}
+
             result = await handle_sendtoai(args)
 
             response_text = result.get("response", "No response received.")
@@ -316,36 +380,8 @@ async def handle_command(request: Request):
 
             logging.debug(f"📝 AI Response: {response_text}")
 
-            try:
-                async with get_db_connection() as conn:  # ✅ FIXED: Use `async with` instead of `async for`
-                    async with conn.begin():
-                        await conn.execute(
-                            text(
-                                "INSERT INTO CommandLogs (aadObjectId, command, command_data, result_data) "
-                                "VALUES (:aadObjectId, :command, :command_data, :result_data)"
-                            ),
-                            {
-                                "aadObjectId": aad_object_id,
-                                "command": "askRabbit",
-                                "command_data": json.dumps({"message": args}),
-                                "result_data": json.dumps({"response": response_text}),
-                            },
-                        )
-                        logging.info("✅ `askRabbit` command logged successfully!")
-            except Exception as e:
-                logging.error(f"❌ Failed to log 'askRabbit' command to database: {e}", exc_info=True)
-
-            adaptive_card = {
-                "type": "AdaptiveCard",
-                "version": "1.2",
-                "body": [
-                    {"type": "TextBlock", "text": "**Rabbit AI Response**", "wrap": True, "weight": "Bolder", "size": "Medium"},
-                    {"type": "TextBlock", "text": f"**Question:** {args}", "wrap": True, "weight": "Bolder"},
-                    {"type": "TextBlock", "text": f"**Answer:**\n\n{response_text}", "wrap": True}
-                ]
-            }
-
-            await send_message_to_teams(service_url, conversation_id, aad_object_id, adaptive_card)
+            await log_askrabbit(aad_object_id, args, response_text)
+            await send_message_to_teams(service_url, conversation_id, aad_object_id, askrabbit_card(args, response_text))
             logging.info("📩 AI response sent to Teams!")
 
             return {"status": "success", "response": response_text}
@@ -353,12 +389,13 @@ async def handle_command(request: Request):
         # **Handle `getnextticket` Command**
         if command_text.startswith("getnextticket"):
             logging.info("🎫 Processing `getnextticket` command...")
-            tickets = await fetch_tickets_from_webhook(aad_object_id)
-            logging.debug(f"📊 Tickets Retrieved: {len(tickets)}")
-
-            top_tickets = await assign_ticket_weights(tickets)
+            top_tickets = await ticket_queues.top(aad_object_id, settings.TICKET_QUEUE_TOP_N)
             logging.debug(f"🏆 Top Ticket(s): {top_tickets}")
 
+            if not top_tickets:
+                logging.info("✅ No tickets assigned to user.")
+                return {"status": "success", "message": "No tickets assigned to you."}
+
             ticket_details = [{"ticket_id": t["id"], "title": t["title"], "points": t["weight"]} for t in top_tickets]
 
             try:
@@ -389,7 +426,7 @@ async def handle_command(request: Request):
         # **Handle `mytickets` Command**
         if command_text.startswith("mytickets"):
             logging.info("📋 Processing `mytickets` command...")
-            tickets = await fetch_tickets_from_webhook(aad_object_id)
+            tickets = await ticket_cache.get(aad_object_id)
 
             if not tickets:
                 logging.info("✅ No tickets assigned to user.")
@@ -399,7 +436,7 @@ async def handle_command(request: Request):
             for ticket in tickets:
                 ticket_id = ticket.get("id", "Unknown")
                 title = ticket.get("title", "Untitled")
-                description = ticket.get("description", "No description available.")[:200] + "..."
+                description = (ticket.get("description") or "No description available.")[:200] + "..."
                 status = ticket.get("status", "Unknown")
                 ticket_url = f"https://ww15.autotask.net/Mvc/ServiceDesk/TicketDetail.mvc?workspace=False&ids%5B0%5D={ticket_id}&ticketId={ticket_id}"
 
@@ -455,10 +492,7 @@ async def handle_command(request: Request):
             # 3️⃣ Extract text
             try:
                 # 3️⃣ Extract text
-                text = ""
-                with pdfplumber.open(local_pdf) as pdf:
-                    for page in pdf.pages:
-                        text += page.extract_text() + "\n"
+                policy_text = await extract_pdf_text(local_pdf)
 
                 # 4️⃣ Chat with OpenAI
                 from azure_openai import secondary_query_openai
@@ -469,7 +503,7 @@ async def handle_command(request: Request):
                              "You are an insurance-policy analyst. "
                              "Summarise mandatory security controls as bullet points."
                          )},
-                        {"role": "user", "content": text},
+                        {"role": "user", "content": policy_text},
                     ],
                     max_tokens=1500,
                     temperature=0
@@ -494,294 +528,238 @@ async def handle_command(request: Request):
         raise HTTPException(status_code=500, detail="Failed to process command.")
 
 
-@app.post("/process_contracts/")
-async def process_contracts(input_data: List[Dict] = Body(...), background_tasks: BackgroundTasks = BackgroundTasks()):
+async def spool_request_body(request: Request, path: str, hasher=None) -> int:
     """
-    Accepts contract data, immediately responds with 200 OK, and processes database updates asynchronously.
+    Streams the raw request body to `path` without parsing it, decoding gzip/deflate/zstd
+    Content-Encoding on the fly. Returns the decompressed byte count, which is held to
+    MAX_BODY_SIZE (chunked and compressed uploads slip past the middleware's content-length check).
+    The decoded bytes are also fed to `hasher` when one is given.
     """
-    logging.info("🔄 Received contract data, starting background processing...")
-
-    # ✅ Send the task to background and immediately return success response
-    background_tasks.add_task(process_contracts_in_background, input_data)
-
-    return {"message": "✅ Received successfully. Processing in background."}
+    try:
+        decoder = BodyDecoder(request.headers.get("content-encoding", "identity"), MAX_BODY_SIZE)
+    except UnsupportedEncodingError as e:
+        raise HTTPException(status_code=415, detail=str(e))
 
+    received = 0
+    try:
+        with open(path, "wb") as f:
+            async for chunk in request.stream():
+                received += len(chunk)
+                for piece in decoder.feed(chunk):
+                    f.write(piece)
+                    if hasher is not None:
+                        hasher.update(piece)
+            for piece in decoder.finish():
+                f.write(piece)
+                if hasher is not None:
+                    hasher.update(piece)
+    except BaseException as e:
+        if os.path.exists(path):
+            os.remove(path)
+        if isinstance(e, DecompressedTooLargeError):
+            raise HTTPException(status_code=413, detail="Request body too large")
+        if isinstance(e, InvalidEncodedBodyError):
+            raise HTTPException(status_code=400, detail=f"Invalid {decoder.encoding} request body: {e}")
+        raise
+
+    if decoder.encoding != "identity":
+        logging.info(f"🗜️ Decoded {received} {decoder.encoding} bytes into {decoder.size} bytes.")
+    return decoder.size
+
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+def ingest_job_response(job_id: str, deduplicated: bool = False) -> JSONResponse:
+    if deduplicated:
+        return JSONResponse(status_code=200, content={
+            "message": "🔁 Duplicate delivery. Already received; not processed again.",
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}",
+            "deduplicated": True,
+        })
+    return JSONResponse(status_code=202, content={
+        "message": "✅ Received successfully. Queued for processing.",
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "deduplicated": False,
+    })
 
-async def process_units_in_background(input_data: List[Dict]):
-    """Background task to insert/merge contract units into the database."""
-    conn = await get_secondary_db_connection()
 
-    logging.info(f"🔍 Connection Type: {type(conn)}")
-    logging.info(f"📦 Received {len(input_data)} contract units to process.")
-    if not input_data:
-        logging.warning("⚠️ No contract unit data received. Exiting function.")
-        conn.close()
-        return
+async def enqueue_ingest_job(kind: str, request: Request, options: Optional[Dict] = None) -> JSONResponse:
+    """
+    Streams an ingest payload (JSON array or NDJSON) into the durable job queue and returns its job id (202).
+    The body is parsed incrementally by the worker, so malformed payloads show up as failed jobs.
 
-    logging.info(f"📦 First contract unit data sample: {input_data[:2]}")  # ✅ Log sample units
+    Retried deliveries are acknowledged (200, `deduplicated: true`) with the original job id instead of
+    being processed again. They are matched on the `Idempotency-Key` header, or on a hash of the decoded
+    body and options when no key is sent.
+    """
+    idempotency_key = request.headers.get("idempotency-key", "").strip() or None
+    if idempotency_key is not None:
+        if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            raise HTTPException(status_code=400,
+                                detail=f"Idempotency-Key must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters")
+        existing = job_queue.find_idempotent(kind, idempotency_key)
+        if existing is not None:
+            logging.info(f"🔁 {kind} delivery with Idempotency-Key {idempotency_key} already queued as job {existing}.")
+            return ingest_job_response(existing, deduplicated=True)
 
     try:
-        for unit in input_data:
-            unit_id = unit.get("id")
-            contract_id = unit.get("contractID")
-            service_id = unit.get("serviceID")
-
-            logging.info(f"🔄 Processing Contract Unit ID: {unit_id}")
-
-            start_dt = await parse_date(unit.get("startDate"))
-            end_dt = await parse_date(unit.get("endDate"))
-            approve_dt = await parse_date(unit.get("approveAndPostDate"))
-
-            query = text("""
-            MERGE INTO dbo.ContractUnits AS target
-            USING (SELECT
-                :id AS id,
-                :contractID AS contractID,
-                :serviceID AS serviceID,
-                :startDate AS startDate,
-                :endDate AS endDate,
-                :approveAndPostDate AS approveAndPostDate,
-                :unitCost AS unitCost,
-                :unitPrice AS unitPrice,
-                :internalCurrencyPrice AS internalCurrencyPrice,
-                :organizationalLevelAssociationID AS organizationalLevelAssociationID,
-                :invoiceDescription AS invoiceDescription,
-                :units AS units
-            ) AS source
-            ON target.id = source.id  
-
-            WHEN MATCHED THEN
-                UPDATE SET
-                    contractID = source.contractID,
-                    serviceID = source.serviceID,
-                    startDate = source.startDate,
-                    endDate = source.endDate,
-                    approveAndPostDate = source.approveAndPostDate,
-                    unitCost = source.unitCost,
-                    unitPrice = source.unitPrice,
-                    internalCurrencyPrice = source.internalCurrencyPrice,
-                    organizationalLevelAssociationID = source.organizationalLevelAssociationID,
-                    invoiceDescription = source.invoiceDescription,
-                    units = source.units
-
-            WHEN NOT MATCHED THEN
-                INSERT (
-                    id, contractID, serviceID, startDate, endDate, approveAndPostDate, 
-                    unitCost, unitPrice, internalCurrencyPrice, organizationalLevelAssociationID, 
-                    invoiceDescription, units
-                )
-                VALUES (
-                    source.id, source.contractID, source.serviceID, source.startDate, 
-                    source.endDate, source.approveAndPostDate, source.unitCost, source.unitPrice, 
-                    source.internalCurrencyPrice, source.organizationalLevelAssociationID, 
-                    source.invoiceDescription, source.units
-                );
-            """)
-
-            values = {
-                "id": unit_id,
-                "contractID": contract_id,
-                "serviceID": service_id,
-                "startDate": start_dt,
-                "endDate": end_dt,
-                "approveAndPostDate": approve_dt,
-                "unitCost": unit.get("unitCost", 0),
-                "unitPrice": unit.get("unitPrice", 0),
-                "internalCurrencyPrice": unit.get("internalCurrencyPrice", 0),
-                "organizationalLevelAssociationID": unit.get("organizationalLevelAssociationID", None),
-                "invoiceDescription": unit.get("invoiceDescription", ""),
-                "units": unit.get("units", 0),
-            }
-
-            try:
-                result = conn.execute(query, values)
-                conn.commit()
-                logging.info(f"✅ Query executed. Affected rows: {result.rowcount}")
-            except Exception as e:
-                logging.critical(f"🔥 Error executing query for Contract Unit ID {unit_id}: {e}", exc_info=True)
+        job_id = job_queue.new_job_id()
+    except QueueFullError as e:
+        logging.warning(f"⏳ Rejecting {kind} upload: {e}")
+        raise HTTPException(status_code=429, detail=f"Ingest queue is full: {e}", headers={"Retry-After": "60"})
+
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    path = job_queue.spool_path(job_id)
+    hasher = hashlib.blake2b(json.dumps(options or {}, sort_keys=True).encode("utf-8"), digest_size=16) \
+        if idempotency_key is None else None
+    size = await spool_request_body(request, path, hasher)
+    if size == 0:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail="Empty request body")
+    if hasher is not None:
+        idempotency_key = f"body:{hasher.hexdigest()}"
+
+    owner = job_queue.enqueue_spooled(job_id, kind, content_type, options, idempotency_key=idempotency_key)
+    if owner != job_id:
+        os.remove(path)
+        return ingest_job_response(owner, deduplicated=True)
+
+    logging.info(f"📦 Spooled {size} bytes of {kind} ({content_type}) as job {job_id}.")
+    return ingest_job_response(job_id)
+
+
+async def process_contracts_in_background(job: Dict, progress: JobProgress) -> Dict:
+    """Ingest job: validates and bulk upserts contracts, then refreshes dbo.ContractSummary."""
+    summary = await ingest_contracts(
+        aiter_batches(job["payload_path"], job["content_type"], INGEST_BATCH_SIZE),
+        on_batch=progress.add_batch,
+        detect_changes=not job["options"].get("force", False),
+    )
+    progress.set_total(summary["rows"])
+    if summary["succeeded"]:
+        # Roll the fresh contracts into ContractSummary now instead of waiting for the next pipeline cycle
+        await update_contract_summary()
+    elif not summary["rows"]:
+        logging.warning("⚠️ No contract data received.")
+    return summary
 
-    finally:
-        conn.close()
-        logging.info("🔌 Database connection closed.")
 
-
-@app.post("/process_contract_units/")
-async def process_contract_units(input_data: List[Dict] = Body(...),
-                                 background_tasks: BackgroundTasks = BackgroundTasks()):
+@app.post("/process_contracts/")
+async def process_contracts(request: Request, force: bool = Query(False)):
     """
-    Accepts contract unit data, immediately responds with 200 OK, and processes database updates asynchronously.
+    Accepts contract data (JSON array or NDJSON), immediately responds with 202 and a job id,
+    and processes database updates in the ingest queue. Unchanged contracts are skipped unless `force` is set.
     """
-    logging.info(f"🔄 Received {len(input_data)} contract units, starting background processing...")
+    logging.info("🔄 Received contract data, queueing for processing...")
+    return await enqueue_ingest_job("contracts", request, options={"force": force})
 
-    # ✅ Send the task to background and immediately return success response
-    background_tasks.add_task(process_units_in_background, input_data)
 
-    return {"message": "✅ Received successfully. Processing in background."}
+async def process_units_in_background(job: Dict, progress: JobProgress) -> Dict:
+    """Ingest job: streams contract units from the spooled payload into the database."""
+    chunk_size = job["options"].get("chunk_size", INGEST_BATCH_SIZE)
+    # DB work runs in worker threads, so the event loop (and /command) stays responsive
+    summary = await ingest_contract_units(
+        aiter_batches(job["payload_path"], job["content_type"], chunk_size),
+        on_batch=progress.add_batch,
+        detect_changes=not job["options"].get("force", False),
+    )
+    progress.set_total(summary["rows"])
+    if not summary["rows"]:
+        logging.warning("⚠️ No contract unit data received.")
+    return summary
 
 
-async def process_timeentries_in_background(input_data: List[Dict]):
-    """Background task to insert/merge time entry data into the database."""
-    conn = await get_secondary_db_connection()
+@app.post("/process_contract_units/")
+async def process_contract_units(request: Request,
+                                 chunk_size: int = Query(INGEST_BATCH_SIZE, ge=1, le=50_000),
+                                 force: bool = Query(False)):
+    """
+    Accepts contract unit data (JSON array or NDJSON), immediately responds with 202 and a job id,
+    and processes database updates in the ingest queue. `chunk_size` controls how many units go into each MERGE.
+    Unchanged units are skipped unless `force` is set.
+    """
+    logging.info("🔄 Received contract units, queueing for processing...")
+    return await enqueue_ingest_job("contract_units", request, options={"chunk_size": chunk_size, "force": force})
 
-    logging.info(f"🔍 Connection Type: {type(conn)}")
-    logging.info(f"📦 Received {len(input_data)} time entries to process.")
 
-    if not input_data:
-        logging.warning("⚠️ No time entry data received. Exiting function.")
-        conn.close()
-        return
+async def process_timeentries_in_background(job: Dict, progress: JobProgress) -> Dict:
+    """Ingest job: streams time entries from the spooled payload into the database."""
+    summary = await ingest_time_entries(
+        aiter_batches(job["payload_path"], job["content_type"], INGEST_BATCH_SIZE),
+        on_batch=progress.add_batch,
+        detect_changes=not job["options"].get("force", False),
+    )
+    progress.set_total(summary["rows"])
+    if not summary["rows"]:
+        logging.warning("⚠️ No time entry data received.")
+    return summary
 
-    logging.info(f"📦 First time entry sample: {input_data[:2]}")  # ✅ Log sample data
 
-    successful_entries = 0
-    failed_entries = 0
+@app.post("/process_time_entries/")
+async def process_time_entries(request: Request, force: bool = Query(False)):
+    """
+    Accepts time entry data (JSON array or NDJSON), immediately responds with 202 and a job id,
+    and processes database updates in the ingest queue. Unchanged entries are skipped unless `force` is set.
+    """
+    logging.info("🔄 Received time entry data, queueing for processing...")
+    return await enqueue_ingest_job("time_entries", request, options={"force": force})
 
-    try:
-        for entry in input_data:
-            entry_id = entry.get("id")
-            contract_id = entry.get("contractID", None)
-
-            # ✅ Ensure contractID is NEVER NULL (set to 0 if missing)
-            if contract_id is None:
-                contract_id = 0  # 👈 Use 0 as fallback for missing contractID
-
-            logging.info(f"🔄 Processing Time Entry ID: {entry_id} with contractID: {contract_id}")
-
-            # ✅ Convert date fields safely
-            create_dt = parse_date(entry.get("createDateTime"))
-            date_worked = parse_date(entry.get("dateWorked"))
-            end_dt = parse_date(entry.get("endDateTime"))
-            last_modified_dt = parse_date(entry.get("lastModifiedDateTime")) or datetime.utcnow()
-            start_dt = parse_date(entry.get("startDateTime"))
-
-            query = text("""
-            MERGE INTO dbo.TimeEntries AS target
-            USING (SELECT
-                :id AS id,
-                :contractID AS contractID,
-                :contractServiceBundleID AS contractServiceBundleID,
-                :contractServiceID AS contractServiceID,
-                :createDateTime AS createDateTime,
-                :creatorUserID AS creatorUserID,
-                :dateWorked AS dateWorked,
-                :endDateTime AS endDateTime,
-                :hoursToBill AS hoursToBill,
-                :hoursWorked AS hoursWorked,
-                :internalNotes AS internalNotes,
-                :isNonBillable AS isNonBillable,
-                :lastModifiedDateTime AS lastModifiedDateTime,
-                :resourceID AS resourceID,
-                :roleID AS roleID,
-                :startDateTime AS startDateTime,
-                :summaryNotes AS summaryNotes,
-                :taskID AS taskID,
-                :ticketID AS ticketID,
-                :timeEntryType AS timeEntryType
-            ) AS source
-            ON target.id = source.id  
-
-            WHEN MATCHED THEN
-                UPDATE SET
-                    contractID = source.contractID,
-                    contractServiceBundleID = source.contractServiceBundleID,
-                    contractServiceID = source.contractServiceID,
-                    createDateTime = source.createDateTime,
-                    creatorUserID = source.creatorUserID,
-                    dateWorked = source.dateWorked,
-                    endDateTime = source.endDateTime,
-                    hoursToBill = source.hoursToBill,
-                    hoursWorked = source.hoursWorked,
-                    internalNotes = source.internalNotes,
-                    isNonBillable = source.isNonBillable,
-                    lastModifiedDateTime = source.lastModifiedDateTime,
-                    resourceID = source.resourceID,
-                    roleID = source.roleID,
-                    startDateTime = source.startDateTime,
-                    summaryNotes = source.summaryNotes,
-                    taskID = source.taskID,
-                    ticketID = source.ticketID,
-                    timeEntryType = source.timeEntryType
-
-            WHEN NOT MATCHED THEN
-                INSERT (
-                    id, contractID, contractServiceBundleID, contractServiceID, createDateTime,
-                    creatorUserID, dateWorked, endDateTime, hoursToBill, hoursWorked,
-                    internalNotes, isNonBillable, lastModifiedDateTime, resourceID, roleID,
-                    startDateTime, summaryNotes, taskID, ticketID, timeEntryType
-                )
-                VALUES (
-                    source.id, source.contractID, source.contractServiceBundleID, source.contractServiceID, source.createDateTime,
-                    source.creatorUserID, source.dateWorked, source.endDateTime, source.hoursToBill, source.hoursWorked,
-                    source.internalNotes, source.isNonBillable, source.lastModifiedDateTime, source.resourceID, source.roleID,
-                    source.startDateTime, source.summaryNotes, source.taskID, source.ticketID, source.timeEntryType
-                );
-            """)
-
-            values = {
-                "id": entry_id,
-                "contractID": contract_id,  # ✅ Guaranteed to have a value (0 if missing)
-                "contractServiceBundleID": entry.get("contractServiceBundleID"),
-                "contractServiceID": entry.get("contractServiceID"),
-                "createDateTime": create_dt,
-                "creatorUserID": entry.get("creatorUserID"),
-                "dateWorked": date_worked,
-                "endDateTime": end_dt,
-                "hoursToBill": entry.get("hoursToBill"),
-                "hoursWorked": entry.get("hoursWorked"),
-                "internalNotes": entry.get("internalNotes"),
-                "isNonBillable": entry.get("isNonBillable"),
-                "lastModifiedDateTime": last_modified_dt,
-                "resourceID": entry.get("resourceID"),
-                "roleID": entry.get("roleID"),
-                "startDateTime": start_dt,
-                "summaryNotes": entry.get("summaryNotes"),
-                "taskID": entry.get("taskID"),
-                "ticketID": entry.get("ticketID"),
-                "timeEntryType": entry.get("timeEntryType"),
-            }
 
-            try:
-                result = conn.execute(query, values)
-                conn.commit()
-                logging.info(f"✅ Query executed for Time Entry ID {entry_id}. Affected rows: {result.rowcount}")
-                successful_entries += 1
-            except Exception as e:
-                logging.error(f"❌ Error executing query for Time Entry ID {entry_id}: {e}", exc_info=True)
-                failed_entries += 1
+async def process_tickets_in_background(job: Dict, progress: JobProgress) -> Dict:
+    """Ingest job: validates tickets and bulk upserts them into dbo.tickets."""
+    summary = await ingest_tickets(
+        aiter_batches(job["payload_path"], job["content_type"], INGEST_BATCH_SIZE),
+        on_batch=progress.add_batch,
+        detect_changes=not job["options"].get("force", False),
+    )
+    progress.set_total(summary["rows"])
+    if not summary["rows"]:
+        logging.warning("⚠️ No ticket data received.")
+    return summary
 
-        logging.info(f"🎯 Completed processing {successful_entries} time entries. {failed_entries} entries had issues.")
 
-    except Exception as e:
-        logging.critical(f"🔥 Critical error during time entry processing: {e}", exc_info=True)
+@app.post("/process_tickets/")
+async def process_tickets(request: Request, force: bool = Query(False)):
+    """
+    Accepts ticket data (JSON array or NDJSON), immediately responds with 202 and a job id,
+    and processes database updates in the ingest queue. Unchanged tickets are skipped unless `force` is set.
+    """
+    logging.info("🔄 Received ticket data, queueing for processing...")
+    return await enqueue_ingest_job("tickets", request, options={"force": force})
 
-    finally:
-        conn.close()
-        logging.info("🔌 Database connection closed.")
 
+@app.get("/process_tickets/watermark")
+async def get_ticket_watermark():
+    """Latest ticket lastActivityDate ingested so far; incremental syncs request only tickets after it."""
+    watermark = row_hash_index.get_watermark("tickets")
+    return {"lastActivityDate": watermark.isoformat() if watermark else None}
 
-async def parse_datetime(date_str):
-    """Converts a date string into a proper datetime format or returns None."""
-    if not date_str:
-        return None
-    try:
-        return datetime.fromisoformat(date_str.rstrip("Z"))  # Handles 'Z' at the end
-    except ValueError:
-        logging.error(f"🚨 Invalid datetime format: {date_str}. Returning None.")
-        return None
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Progress, row counts and throughput for an ingest job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-@app.post("/process_time_entries/")
-async def process_time_entries(input_data: List[Dict] = Body(...),
-                               background_tasks: BackgroundTasks = BackgroundTasks()):
-    """
-    Accepts time entry data, immediately responds with 200 OK, and processes database updates asynchronously.
-    """
-    logging.info("🔄 Received time entry data, starting background processing...")
-
-    # ✅ Send the task to background and immediately return success response
-    background_tasks.add_task(process_timeentries_in_background, input_data)
 
-    return {"message": "✅ Received successfully. Processing in background."}
+@app.get("/metrics", dependencies=[Depends(get_api_key)])
+async def get_metrics():
+    """Cache and client metrics for the outbound integrations."""
+    return {
+        "bot_token": bot_token_manager.metrics(),
+        "openai": openai_gateway.metrics(),
+        "openai_rate_limits": openai_rate_limiter.metrics(),
+        "llm_cache": llm_cache.metrics(),
+        "tokenizer": tokenizer_metrics(),
+        "ticket_source": ticket_source.metrics(),
+        "ticket_cache": ticket_cache.metrics(),
+        "ticket_queues": ticket_queues.metrics(),
+    }
 
 
 @app.get("/update-client-revenue/")
@@ -797,3 +775,62 @@ async def startup_kpi_event():
     """Start automatic updates when FastAPI starts."""
     logging.info("🚀 FastAPI startup: Initializing KPI update process...")
     await start_kpi_background_update()
+
+
+@app.on_event("startup")
+async def startup_http_clients():
+    """Opens the pooled outbound HTTP clients shared by the bot, webhook and AI calls."""
+    await http_clients.start()
+
+
+@app.on_event("startup")
+async def startup_tokenizer():
+    """Loads the tiktoken encoding (downloading it if not cached) so prompt budgets use real token counts."""
+    await asyncio.to_thread(load_encoding)
+
+
+@app.on_event("startup")
+async def startup_teams_keys():
+    """Warms the Bot Framework signing key cache so the first /command doesn't pay for it."""
+    teams_key_store.refresh()
+
+
+@app.on_event("startup")
+async def startup_ticket_queues():
+    """Starts the worker that keeps technicians' next-ticket queues precomputed."""
+    await ticket_queues.start()
+
+
+@app.on_event("startup")
+async def startup_ingest_workers():
+    """Registers ingest job handlers and starts the bounded worker pool."""
+    job_queue.register("contracts", process_contracts_in_background)
+    job_queue.register("contract_units", process_units_in_background)
+    job_queue.register("time_entries", process_timeentries_in_background)
+    job_queue.register("tickets", process_tickets_in_background)
+    logging.info(f"🚀 FastAPI startup: Starting {job_queue.workers} ingest workers...")
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_ingest_workers():
+    """Stops ingest workers; interrupted jobs are re-queued on the next start."""
+    await job_queue.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_ticket_queues():
+    """Stops the next-ticket queue worker."""
+    await ticket_queues.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    """Closes pooled outbound HTTP connections."""
+    await http_clients.close()
+
+
+@app.on_event("shutdown")
+async def shutdown_pdf_workers():
+    """Stops the PDF text extraction processes."""
+    await asyncio.to_thread(pdf_extractor.shutdown)
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict, Union, Any
 from datetime import datetime
 
+from services.timestamps import parse_naive_utc
+
 from pydantic_settings import BaseSettings
 
 
@@ -24,6 +26,41 @@ class Settings(BaseSettings):
     DB_SERVER: str
     DB_NAME: str
     DB_SECONDARY_NAME: str
+    INGEST_BATCH_SIZE: int = 1000  # Rows per staging-table MERGE
+    INGEST_STATE_DIR: str = "/var/tmp/rabbitai/ingest"  # Job queue DB + spooled payloads
+    INGEST_WORKERS: int = 2  # Concurrent ingest jobs per process
+    INGEST_MAX_PENDING_JOBS: int = 20  # Queued + running jobs before POSTs get 429
+    INGEST_IDEMPOTENCY_TTL_HOURS: int = 24  # How long a delivery's idempotency key is remembered
+    INGEST_IDEMPOTENCY_MAX_KEYS: int = 10000  # Oldest keys are evicted past this many
+    AZURE_OPENAI_API_VERSION: str = "2023-05-15"
+    POLICY_DEPLOYMENT_NAME: str = "rabbit"  # Deployment used for insurance-policy analysis
+    OPENAI_TIMEOUT_SECONDS: float = 120.0  # Per-request timeout for chat completions
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    RECOMMENDATION_CONCURRENCY: int = 4  # Parallel completions per /report/ request
+    OPENAI_RPM_LIMIT: int = 300  # Requests per minute per deployment (match the Azure quota)
+    OPENAI_TPM_LIMIT: int = 50000  # Tokens per minute per deployment (prompt + max_tokens)
+    OPENAI_MAX_RETRIES: int = 4  # Retries after a 429 before giving up
+    LLM_CACHE_DIR: str = "/var/tmp/rabbitai/llm"  # SQLite cache of chat completions
+    LLM_CACHE_TTL_HOURS: int = 168
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    ASKRABBIT_STREAMING: bool = True  # Post a placeholder card and fill it in as the answer streams
+    ASKRABBIT_UPDATE_INTERVAL_SECONDS: float = 1.5  # Min gap between in-place card updates
+    POLICY_CHUNK_TOKENS: int = 3000  # Prompt budget per policy chunk sent for extraction
+    POLICY_CHUNK_OVERLAP_TOKENS: int = 200  # Carried over when a section has to be split
+    POLICY_EXTRACT_CONCURRENCY: int = 4  # Chunks extracted in parallel per policy
+    TIKTOKEN_CACHE_DIR: str = "/var/tmp/rabbitai/tiktoken"  # Where tiktoken keeps its downloaded BPE files
+    PDF_EXTRACT_WORKERS: int = 2  # Processes parsing PDF pages
+    PDF_EXTRACT_TIMEOUT_SECONDS: float = 120.0  # Per-document limit for text extraction
+    PDF_MAX_PAGES: int = 500  # Larger PDFs are rejected
+    PDF_PAGES_PER_TASK: int = 8  # Page range handed to one worker at a time
+    TICKET_CACHE_TTL_SECONDS: float = 60.0  # Per-technician ticket lists younger than this are served as-is
+    TICKET_CACHE_MAX_STALE_SECONDS: float = 900.0  # Older lists are served while refreshing, up to this age
+    TICKET_CACHE_MAX_USERS: int = 500
+    TICKET_QUEUE_REFRESH_SECONDS: float = 300.0  # How often precomputed next-ticket queues are refreshed
+    TICKET_QUEUE_ACTIVE_HOURS: float = 8.0  # Technicians who haven't asked for a ticket in this long are dropped
+    TICKET_QUEUE_REFRESH_CONCURRENCY: int = 4  # Parallel ticket fetches per refresh cycle
+    TICKET_QUEUE_TOP_N: int = 3  # Tickets shown by getnextticket
+    TICKET_SOURCE: str = "webhook"  # "webhook" (Rewst) or "sql" (dbo.tickets, falling back to the webhook)
     class Config:
         env_file = ".env"
 
@@ -73,9 +110,12 @@ class TicketData(BaseModel):
         "lastActivityDate",
         pre=True
     )
-    async def parse_datetime(cls, value):
+    def parse_datetime(cls, value):
         if isinstance(value, str):
-            return datetime.fromisoformat(value.replace("Z", ""))
+            parsed = parse_naive_utc(value)
+            if parsed is None:
+                raise ValueError(f"Invalid datetime: {value}")
+            return parsed
         return value
 class DeviceData(BaseModel):
     Name: str = "N/A"
@@ -160,11 +200,11 @@ class ProcessedContractUnit(BaseModel):
 class Contract(BaseModel):
     id: int
     status: int
-    endDate: str
+    endDate: datetime
     setupFee: Optional[float] = None
     companyID: int
     contactID: Optional[int] = None
-    startDate: str
+    startDate: datetime
     contactName: Optional[str] = None
     description: Optional[str] = None
     isCompliant: bool
@@ -185,7 +225,7 @@ class Contract(BaseModel):
     overageBillingRate: Optional[float] = None
     exclusionContractID: Optional[int] = None
     purchaseOrderNumber: Optional[str] = None
-    lastModifiedDateTime: str
+    lastModifiedDateTime: datetime
     setupFeeBillingCodeID: Optional[int] = None
     billToCompanyContactID: Optional[int] = None
     contractExclusionSetID: Optional[int] = None
@@ -196,9 +236,12 @@ class Contract(BaseModel):
     timeReportingRequiresStartAndStopTimes: int
 
     @validator("startDate", "endDate", "lastModifiedDateTime", pre=True)
-    async def parse_dates(cls, v):
+    def parse_dates(cls, v):
         if isinstance(v, str):
-            return datetime.fromisoformat(v.replace("Z", ""))
+            parsed = parse_naive_utc(v)
+            if parsed is None:
+                raise ValueError(f"Invalid datetime: {v}")
+            return parsed
         return v
 
 class TimeEntries(BaseModel):
@@ -225,16 +268,10 @@ class TimeEntries(BaseModel):
     userDefinedFields: Optional[List]
 
     @validator("createDateTime", "dateWorked", "endDateTime", "lastModifiedDateTime", "startDateTime", pre=True)
-    async def parse_datetime(cls, value):
-        """Converts string timestamps into datetime objects"""
+    def parse_datetime(cls, value):
+        """Converts string timestamps into datetime objects (None if unparseable)"""
         if isinstance(value, str):
-            try:
-                return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")  # Handles fractional seconds
-            except ValueError:
-                try:
-                    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")  # Handles 'Z' format without milliseconds
-                except ValueError:
-                    return None  # Return None if parsing fails
+            return parse_naive_utc(value)
         return value
 
 class ResourceResponseResolution(BaseModel):
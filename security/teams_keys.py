@@ -0,0 +1,121 @@
+# security/teams_keys.py
+"""
+Process-wide cache of the Bot Framework OpenID configuration, its signing keys
+and recently verified tokens, so validating a Teams request is normally a
+local signature check instead of two HTTP round trips.
+
+Keys are refreshed in the background once they are older than `ttl_seconds`,
+and on demand (rate limited) when a token names a `kid` we have not seen.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import jwt
+
+from config import OPENID_CONFIG_URL, APP_ID
+from services.http_clients import http_clients
+
+BOT_FRAMEWORK_ISSUER = "https://api.botframework.com"
+
+
+class TeamsKeyStore:
+    def __init__(self, openid_config_url: str, audience: str, issuer: str = BOT_FRAMEWORK_ISSUER,
+                 ttl_seconds: int = 24 * 3600, max_age_seconds: int = 5 * 24 * 3600,
+                 unknown_kid_cooldown: int = 300, max_cached_tokens: int = 1024, leeway: int = 60):
+        self.openid_config_url = openid_config_url
+        self.audience = audience
+        self.issuer = issuer
+        self.ttl_seconds = ttl_seconds            # Soft TTL: refresh in the background, keep serving
+        self.max_age_seconds = max_age_seconds    # Hard TTL: refuse keys older than this until refreshed
+        self.unknown_kid_cooldown = unknown_kid_cooldown
+        self.max_cached_tokens = max_cached_tokens
+        self.leeway = leeway
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._last_forced_refresh = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._verified: "OrderedDict[bytes, dict]" = OrderedDict()
+
+    # ----------------------------- signing keys -----------------------------
+    async def _fetch_keys(self):
+        client = http_clients.get("login")
+        response = await client.get(self.openid_config_url, timeout=10)
+        response.raise_for_status()
+        jwks_uri = response.json()["jwks_uri"]
+
+        response = await client.get(jwks_uri, timeout=10)
+        response.raise_for_status()
+        key_set = jwt.PyJWKSet.from_dict(response.json())
+
+        self._keys = {key.key_id: key for key in key_set.keys if key.key_id}
+        self._fetched_at = time.monotonic()
+        logging.info(f"🔑 Loaded {len(self._keys)} Bot Framework signing keys.")
+
+    def refresh(self) -> asyncio.Task:
+        """Starts a key refresh, or returns the one already in flight (concurrent callers share it)."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch_keys())
+            self._refresh_task.add_done_callback(self._log_refresh_failure)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_refresh_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"❌ Failed to refresh Bot Framework signing keys: {task.exception()}")
+
+    async def get_signing_key(self, kid: Optional[str]) -> jwt.PyJWK:
+        age = time.monotonic() - self._fetched_at
+        if not self._keys or age > self.max_age_seconds:
+            await asyncio.shield(self.refresh())
+        elif age > self.ttl_seconds:
+            self.refresh()  # Stale but usable: serve from cache while refreshing
+
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._last_forced_refresh > self.unknown_kid_cooldown:
+            # Keys may have rotated; refetch once, rate limited so bogus kids can't hammer the endpoint
+            logging.info(f"🔄 Unknown signing key id {kid}; refreshing Bot Framework keys.")
+            self._last_forced_refresh = time.monotonic()
+            await asyncio.shield(self.refresh())
+            key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key id: {kid}")
+        return key
+
+    # ----------------------------- tokens -----------------------------------
+    async def validate(self, token: str) -> dict:
+        """
+        Verifies a Bot Framework bearer token and returns its claims.
+        Raises jwt.InvalidTokenError when the token is not acceptable.
+        """
+        cache_key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+        claims = self._verified.get(cache_key)
+        if claims is not None:
+            if claims.get("exp", 0) > time.time() + self.leeway:
+                self._verified.move_to_end(cache_key)
+                return claims
+            del self._verified[cache_key]
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        signing_key = await self.get_signing_key(kid)
+        claims = jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=["RS256"],
+            audience=self.audience,
+            issuer=self.issuer,
+            leeway=self.leeway,
+        )
+
+        if "exp" in claims:
+            self._verified[cache_key] = claims
+            if len(self._verified) > self.max_cached_tokens:
+                self._verified.popitem(last=False)
+        return claims
+
+
+teams_key_store = TeamsKeyStore(OPENID_CONFIG_URL, audience=APP_ID)
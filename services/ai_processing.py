@@ -1,72 +1,66 @@
+import asyncio
 import logging
-import json
 import re
 from typing import List, Dict
 import httpx
-from config import logger, AZURE_API_KEY, AZURE_OPENAI_ENDPOINT, deployment_name
+from config import logger, settings
+from services.openai_gateway import openai_gateway
 # AI Processing
 async def generate_recommendations(analytics: Dict[str, dict]) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Generates one strategic recommendation per populated issue type. Completions run concurrently
+    (at most RECOMMENDATION_CONCURRENCY at a time) and come back in issue-type order.
+    """
     recommendations = {
         "device_recommendations": [],
         "strategic_plan": []
     }
-
-    for issue_type, devices in analytics["issues"].items():
-        if devices:
-            # Ensure devices is a list of dictionaries with 'device_name' key
-            if isinstance(devices, list) and all(isinstance(device, dict) and "device_name" in device for device in devices):
-                recommendation = await generate_ai_recommendation(issue_type, devices)
-                recommendations["strategic_plan"].append(recommendation)
-            else:
-                logger.error(f"Unexpected data structure for devices in issue type {issue_type}: {devices}")
-                recommendations["strategic_plan"].append({
-                    "issue_type": issue_type,
-                    "recommendation": "Error: Data structure issue; unable to generate recommendation."
-                })
-
+    semaphore = asyncio.Semaphore(settings.RECOMMENDATION_CONCURRENCY)
+
+    async def recommend(issue_type: str, devices) -> Dict[str, str]:
+        # Ensure devices is a list of dictionaries with 'device_name' key
+        if not (isinstance(devices, list) and all(isinstance(device, dict) and "device_name" in device for device in devices)):
+            logger.error(f"Unexpected data structure for devices in issue type {issue_type}: {devices}")
+            return {
+                "issue_type": issue_type,
+                "recommendation": "Error: Data structure issue; unable to generate recommendation."
+            }
+        try:
+            async with semaphore:
+                return await generate_ai_recommendation(issue_type, devices)
+        except Exception as e:
+            logger.error(f"❌ Recommendation for {issue_type} failed: {e}", exc_info=True)
+            return {
+                "issue_type": issue_type,
+                "recommendation": "Error: Unable to generate recommendation."
+            }
+
+    # gather keeps input order, so the plan is deterministic regardless of which completion finishes first
+    recommendations["strategic_plan"] = await asyncio.gather(
+        *(recommend(issue_type, devices) for issue_type, devices in analytics["issues"].items() if devices)
+    )
     return recommendations
 
 async def generate_ai_recommendation(issue_type: str, issue_details: List[Dict[str, str]]) -> Dict[str, str]:
-    global response
-    prompt = build_recommendation_prompt(issue_type, issue_details)
-
-    url = f"{AZURE_OPENAI_ENDPOINT}/openai/deployments/{deployment_name}/chat/completions?api-version=2023-05-15"
+    prompt = await build_recommendation_prompt(issue_type, issue_details)
+    logger.debug(f"Sending recommendation prompt to Azure OpenAI: {prompt}")
 
     try:
-        data = {
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 200,
-            "temperature": 0.7,
-            "n": 1
-        }
-
-        logger.debug(f"Sending payload to Azure OpenAI: {json.dumps(data)}")
-
-        response = httpx.post(
-            url,
-            headers={
-                "Content-Type": "application/json",
-                "api-key": AZURE_API_KEY
-            },
-            json=data
-        )
-
-        response.raise_for_status()
-
-        recommendation_text = response.json()['choices'][0]['message']['content'].strip()
+        # The prompt is fully determined by the issue type and device names, so reuse earlier plans
+        recommendation_text = await openai_gateway.complete(prompt, max_tokens=200, temperature=0.7, cache=True)
         return {
             "issue_type": issue_type,
             "recommendation": recommendation_text
         }
 
     except httpx.HTTPStatusError as e:
-        logger.error(f"Failed to retrieve recommendation text: {e} - Response: {response.text}")
+        logger.error(f"Failed to retrieve recommendation text: {e} - Response: {e.response.text}")
         return {
             "issue_type": issue_type,
             "recommendation": "Error: Unable to generate recommendation due to API error."
         }
-    except KeyError:
-        logger.error(f"Unexpected response format: {response.json()}")
+    except (KeyError, IndexError):
+        logger.error(f"Unexpected response format from Azure OpenAI for issue type {issue_type}")
         return {
             "issue_type": issue_type,
             "recommendation": "Error: Unexpected response format from Azure OpenAI API."
@@ -126,6 +120,32 @@ async def build_recommendation_prompt(issue_type: str, issue_details: List[Dict[
             f"Generate a plan addressing device lifecycle management, compliance, and proactive monitoring."
         )
 
+def format_ai_response(ai_result: str) -> List[Dict]:
+    """Splits an answer into Adaptive Card TextBlocks, keeping ``` code blocks as their own blocks."""
+    # Separate text and code using regex
+    parts = re.split(r"```(?:\w+\n)?", ai_result)  # Splits text around code blocks
+    formatted_response = []
+
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            # Plain text (outside code blocks)
+            formatted_response.append({
+                "type": "TextBlock",
+                "text": part.strip(),
+                "wrap": True,
+                "size": "Medium"
+            })
+        else:
+            # Code snippet (inside code blocks)
+            formatted_response.append({
+                "type": "TextBlock",
+                "text": f"```\n{part.strip()}\n```",
+                "wrap": True,
+                "size": "Medium"
+            })
+    return formatted_response
+
+
 async def handle_sendtoai(data: str) -> dict:
     """
     Sends user input to Azure OpenAI for processing and returns the result.
@@ -133,56 +153,13 @@ async def handle_sendtoai(data: str) -> dict:
     if not data:
         return {"response": "No text provided for AI processing."}
 
-    # Build the payload
-    url = f"{AZURE_OPENAI_ENDPOINT}/openai/deployments/{deployment_name}/chat/completions?api-version=2023-05-15"
-    payload = {
-        "messages": [{"role": "user", "content": data}],
-        "max_tokens": 4096,
-        "temperature": 0.7,
-        "n": 1,
-    }
-
     try:
         # Send the request to Azure OpenAI
-        async with httpx.AsyncClient() as client:
-            responses = await client.post(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    "api-key": AZURE_API_KEY,
-                },
-                json=payload,
-            )
-            responses.raise_for_status()
-
-            # Parse the response
-            ai_result = responses.json()["choices"][0]["message"]["content"].strip()
-            logging.info(f"Full AI Result: {ai_result}")
-
-            # Separate text and code using regex
-            parts = re.split(r"```(?:\w+\n)?", ai_result)  # Splits text around code blocks
-            formatted_response = []
-
-            for i, part in enumerate(parts):
-                if i % 2 == 0:
-                    # Plain text (outside code blocks)
-                    formatted_response.append({
-                        "type": "TextBlock",
-                        "text": part.strip(),
-                        "wrap": True,
-                        "size": "Medium"
-                    })
-                else:
-                    # Code snippet (inside code blocks)
-                    formatted_response.append({
-                        "type": "TextBlock",
-                        "text": f"```\n{part.strip()}\n```",
-                        "wrap": True,
-                        "size": "Medium"
-                    })
+        ai_result = await openai_gateway.complete(data, max_tokens=4096, temperature=0.7)
+        logging.info(f"Full AI Result: {ai_result}")
 
-            return {"response": formatted_response}
+        return {"response": format_ai_response(ai_result)}
     except httpx.HTTPStatusError as e:
         return {"response": f"Error communicating with OpenAI: {e.response.text}"}
-    except KeyError:
+    except (KeyError, IndexError):
         return {"response": "Error: Unexpected response format from OpenAI."}
\ No newline at end of file
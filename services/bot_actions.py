@@ -1,7 +1,10 @@
+import asyncio
 import logging
+import time
 import httpx
 from fastapi import HTTPException
 from config import settings
+from services.http_clients import http_clients
 
 # Configure logging to capture detailed information
 logging.basicConfig(
@@ -10,37 +13,126 @@ logging.basicConfig(
 )
 
 
-async def get_bot_token():
-    """Fetches a bot authentication token from Microsoft."""
-    url = "https://login.microsoftonline.com/botframework.com/oauth2/v2.0/token"
-    payload = {
-        "grant_type": "client_credentials",
-        "client_id": settings.BOT_CLIENT_ID,
-        "client_secret": settings.BOT_CLIENT_SECRET,
-        "scope": "https://api.botframework.com/.default"
-    }
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+class BotTokenManager:
+    """
+    Caches the Bot Framework client-credentials token until shortly before it expires.
+    Once `refresh_fraction` of its lifetime has passed, callers still get the cached token
+    while a refresh runs in the background. Concurrent refreshes share a single request.
+    """
+
+    URL = "https://login.microsoftonline.com/botframework.com/oauth2/v2.0/token"
+
+    def __init__(self, expiry_margin: int = 300, refresh_fraction: float = 0.8):
+        self.expiry_margin = expiry_margin
+        self.refresh_fraction = refresh_fraction
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._refresh_task = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    async def _fetch(self):
+        """Fetches a bot authentication token from Microsoft."""
+        payload = {
+            "grant_type": "client_credentials",
+            "client_id": settings.BOT_CLIENT_ID,
+            "client_secret": settings.BOT_CLIENT_SECRET,
+            "scope": "https://api.botframework.com/.default"
+        }
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
 
-    logging.debug(f"[get_bot_token] Requesting bot token from: {url}")
-    logging.debug(f"[get_bot_token] Payload: {payload}")
+        logging.debug(f"[get_bot_token] Requesting bot token from: {self.URL}")
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, data=payload, headers=headers)
+        try:
+            client = http_clients.get("login")
+            response = await client.post(self.URL, data=payload, headers=headers)
             response.raise_for_status()
 
             token_data = response.json()
             logging.info(f"[get_bot_token] Token acquired successfully.")
-            logging.debug(f"[get_bot_token] Full token response: {token_data}")
 
-            return token_data["access_token"]
+        except httpx.HTTPStatusError as e:
+            self.refresh_failures += 1
+            logging.error(f"[get_bot_token] HTTP Error: {e.response.status_code} - {e.response.text}")
+            raise HTTPException(status_code=401, detail="Failed to authenticate bot.")
+        except Exception as e:
+            self.refresh_failures += 1
+            logging.critical(f"[get_bot_token] Unexpected error: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Unexpected error fetching bot token.")
+
+        lifetime = int(token_data.get("expires_in", 3600))
+        now = time.monotonic()
+        self._token = token_data["access_token"]
+        self._expires_at = now + lifetime - self.expiry_margin
+        self._refresh_at = now + lifetime * self.refresh_fraction
+        self.refreshes += 1
+        return self._token
+
+    def _refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+            self._refresh_task.add_done_callback(self._log_background_failure)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_background_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"[get_bot_token] Token refresh failed: {task.exception()}")
+
+    async def get_token(self) -> str:
+        now = time.monotonic()
+        if self._token is not None and now < self._expires_at:
+            self.hits += 1
+            if now >= self._refresh_at:
+                self._refresh()  # Proactive: the current token is still good for a while
+            return self._token
+
+        self.misses += 1
+        return await asyncio.shield(self._refresh())
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "expires_in_seconds": round(max(self._expires_at - time.monotonic(), 0), 1) if self._token else None,
+        }
 
-    except httpx.HTTPStatusError as e:
-        logging.error(f"[get_bot_token] HTTP Error: {e.response.status_code} - {e.response.text}")
-        raise HTTPException(status_code=401, detail="Failed to authenticate bot.")
-    except Exception as e:
-        logging.critical(f"[get_bot_token] Unexpected error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Unexpected error fetching bot token.")
+
+bot_token_manager = BotTokenManager()
+
+
+async def get_bot_token():
+    """Returns a cached bot authentication token, fetching a new one only when needed."""
+    return await bot_token_manager.get_token()
+
+
+def build_card_activity(user_upn, adaptive_card) -> dict:
+    """Bot Framework message activity carrying a single Adaptive Card."""
+    return {
+        "type": "message",
+        "conversation": {"isGroup": False},
+        "recipient": {"id": user_upn},
+        "from": {
+            "id": "28:431fa8f7-defa-4136-9be9-3e446a00027b",
+            "name": "Rabbot"
+        },
+        "channelData": {
+            "tenant": {"id": "c89aa4c2-4436-410b-8410-35695c2a9f30"}
+        },
+        "attachments": [
+            {
+                "contentType": "application/vnd.microsoft.card.adaptive",
+                "content": adaptive_card
+            }
+        ]
+    }
 
 
 async def send_message_to_teams(service_url, conversation_id, user_upn, adaptive_card):
@@ -61,24 +153,7 @@ async def send_message_to_teams(service_url, conversation_id, user_upn, adaptive
         logging.debug(f"[send_message_to_teams] Target URL: {url}")
 
         # Step 3: Build payload
-        payload = {
-            "type": "message",
-            "conversation": {"isGroup": False},
-            "recipient": {"id": user_upn},
-            "from": {
-                "id": "28:431fa8f7-defa-4136-9be9-3e446a00027b",
-                "name": "Rabbot"
-            },
-            "channelData": {
-                "tenant": {"id": "c89aa4c2-4436-410b-8410-35695c2a9f30"}
-            },
-            "attachments": [
-                {
-                    "contentType": "application/vnd.microsoft.card.adaptive",
-                    "content": adaptive_card
-                }
-            ]
-        }
+        payload = build_card_activity(user_upn, adaptive_card)
         logging.debug(f"[send_message_to_teams] Final Payload: {payload}")
 
         # Step 4: Send POST request
@@ -88,15 +163,15 @@ async def send_message_to_teams(service_url, conversation_id, user_upn, adaptive
         }
         logging.info("[send_message_to_teams] Sending message to Teams...")
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
+        client = http_clients.get("teams")
+        response = await client.post(url, headers=headers, json=payload)
+        response.raise_for_status()
 
-            logging.info("[send_message_to_teams] Message successfully sent to Teams!")
-            logging.debug(f"[send_message_to_teams] Response Status: {response.status_code}")
-            logging.debug(f"[send_message_to_teams] Response Body: {response.text}")
+        logging.info("[send_message_to_teams] Message successfully sent to Teams!")
+        logging.debug(f"[send_message_to_teams] Response Status: {response.status_code}")
+        logging.debug(f"[send_message_to_teams] Response Body: {response.text}")
 
-            return response.json()
+        return response.json()
 
     except httpx.HTTPStatusError as e:
         logging.error(f"[send_message_to_teams] HTTP Error: {e.response.status_code} - {e.response.text}")
@@ -104,3 +179,23 @@ async def send_message_to_teams(service_url, conversation_id, user_upn, adaptive
     except Exception as e:
         logging.critical(f"[send_message_to_teams] Unexpected error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Unexpected error while sending message to Teams.")
+
+
+async def update_teams_message(service_url, conversation_id, activity_id, user_upn, adaptive_card):
+    """Replaces the card of a message the bot already sent (used for progressive replies)."""
+    url = f"{service_url}/v3/conversations/{conversation_id}/activities/{activity_id}"
+    try:
+        token = await get_bot_token()
+        payload = {**build_card_activity(user_upn, adaptive_card), "id": activity_id}
+        response = await http_clients.get("teams").put(
+            url,
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            json=payload,
+        )
+        response.raise_for_status()
+        logging.debug(f"[update_teams_message] Updated activity {activity_id}.")
+        return response.json() if response.content else {}
+
+    except httpx.HTTPStatusError as e:
+        logging.error(f"[update_teams_message] HTTP Error: {e.response.status_code} - {e.response.text}")
+        raise HTTPException(status_code=e.response.status_code, detail="Failed to update Teams message.")
@@ -0,0 +1,114 @@
+# services/bulk_upsert.py
+"""
+Set-based bulk upsert engine for the secondary (Autotask mirror) database.
+
+Each batch is landed in a session-scoped #temp staging table with a single
+fast_executemany INSERT and then applied with ONE MERGE, all inside one
+transaction. Replaces the old "MERGE + commit per row" loops.
+"""
+
+import asyncio
+import logging
+from typing import List, Dict, Sequence, Iterator, Callable, Optional
+
+from sqlalchemy import text
+
+from config import secondary_sync_engine
+
+
+def chunked(rows: Sequence[Dict], size: int) -> Iterator[Sequence[Dict]]:
+    """Yields consecutive slices of at most `size` rows."""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def dedupe_by_key(rows: Sequence[Dict], key: str) -> List[Dict]:
+    """
+    Collapses rows sharing the same key, last write wins (a MERGE source may not
+    touch the same target row twice). Keeps the position of the first occurrence.
+    """
+    latest: Dict = {}
+    for row in rows:
+        latest[row.get(key)] = row
+    return list(latest.values())
+
+
+def build_merge_sql(table: str, stage: str, key: str, columns: List[str]) -> str:
+    """Builds the MERGE that applies the staging table to the target table."""
+    updates = ",\n            ".join(f"{col} = source.{col}" for col in columns if col != key)
+    insert_cols = ", ".join(columns)
+    insert_vals = ", ".join(f"source.{col}" for col in columns)
+    return f"""
+        MERGE INTO {table} WITH (HOLDLOCK) AS target
+        USING {stage} AS source
+        ON target.{key} = source.{key}
+        WHEN MATCHED THEN
+            UPDATE SET
+            {updates}
+        WHEN NOT MATCHED THEN
+            INSERT ({insert_cols})
+            VALUES ({insert_vals});
+    """
+
+
+def merge_batch(table: str, key: str, columns: List[str], rows: Sequence[Dict], engine=None) -> int:
+    """
+    Upserts one batch through a #temp staging table in a single transaction.
+    Blocking – call it through `asyncio.to_thread` from async code.
+    Returns the number of rows affected by the MERGE.
+    """
+    if not rows:
+        return 0
+
+    engine = engine or secondary_sync_engine
+    stage = f"#stage_{table.split('.')[-1]}"
+    col_list = ", ".join(columns)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"IF OBJECT_ID('tempdb..{stage}') IS NOT NULL DROP TABLE {stage}"))
+        # The UNION ALL keeps SQL Server from copying an IDENTITY property onto the staging table
+        conn.execute(text(
+            f"SELECT {col_list} INTO {stage} FROM {table} WHERE 1 = 0 "
+            f"UNION ALL SELECT {col_list} FROM {table} WHERE 1 = 0"
+        ))
+        conn.execute(
+            text(f"INSERT INTO {stage} ({col_list}) VALUES ({', '.join(':' + c for c in columns)})"),
+            list(rows),
+        )
+        result = conn.execute(text(build_merge_sql(table, stage, key, columns)))
+        affected = result.rowcount
+        conn.execute(text(f"DROP TABLE {stage}"))
+
+    return affected
+
+
+async def merge_rows(table: str, key: str, columns: List[str], batch: Sequence[Dict],
+                     index: int = 1, engine=None) -> Dict:
+    """
+    Upserts one batch off the event loop and returns its result dict:
+    {"batch", "rows", "succeeded", "failed", "affected"}. Failures are logged and reported, not raised.
+    """
+    try:
+        affected = await asyncio.to_thread(merge_batch, table, key, columns, batch, engine)
+        logging.info(f"✅ {table} batch {index}: {len(batch)} rows merged ({affected} affected).")
+        return {"batch": index, "rows": len(batch), "succeeded": len(batch), "failed": 0, "affected": affected}
+    except Exception as e:
+        logging.error(f"❌ {table} batch {index} failed ({len(batch)} rows): {e}", exc_info=True)
+        return {"batch": index, "rows": len(batch), "succeeded": 0, "failed": len(batch), "affected": 0}
+
+
+async def bulk_merge(table: str, key: str, columns: List[str], rows: Sequence[Dict],
+                     batch_size: int, engine=None,
+                     on_batch: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    """
+    Upserts an in-memory list batch by batch and returns one result dict per batch.
+    A failing batch is rolled back and reported; later batches still run.
+    `on_batch` is called with each result as soon as its batch completes.
+    """
+    results = []
+    for index, batch in enumerate(chunked(rows, batch_size), start=1):
+        result = await merge_rows(table, key, columns, batch, index, engine)
+        results.append(result)
+        if on_batch is not None:
+            on_batch(result)
+    return results
@@ -0,0 +1,111 @@
+# services/change_detection.py
+"""
+Content-hash change detection for ingest.
+
+Keeps a local SQLite index of (kind, id) → hash of the last row successfully
+merged, so re-sent but unchanged Autotask rows can skip the MERGE entirely.
+If the index is lost, every row simply counts as changed again.
+
+The same file keeps per-kind high watermarks (e.g. max ticket lastActivityDate)
+that incremental syncs use to request only deltas.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+
+LOOKUP_CHUNK = 500  # Stay well under SQLite's bound-parameter limit
+
+
+def row_hash(record: Dict) -> bytes:
+    """Stable 128-bit hash of a record's canonical JSON form."""
+    canonical = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+
+class RowHashIndex:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS row_hashes (
+            kind TEXT NOT NULL,
+            id TEXT NOT NULL,
+            hash BLOB NOT NULL,
+            PRIMARY KEY (kind, id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS watermarks (
+            kind TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(self.SCHEMA)
+        return self._db
+
+    def _lookup(self, kind: str, ids: Sequence[str]) -> Dict[str, bytes]:
+        known = {}
+        with self._lock:
+            db = self._connect()
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                known.update(db.execute(
+                    f"SELECT id, hash FROM row_hashes WHERE kind = ? AND id IN ({placeholders})",
+                    (kind, *chunk),
+                ).fetchall())
+        return known
+
+    def filter_changed(self, kind: str, records: Sequence[Dict], key: str = "id") -> Tuple[List[Dict], Dict[str, bytes]]:
+        """
+        Returns (records that are new or changed, their hashes by id).
+        Blocking – call it through `asyncio.to_thread` from async code.
+        """
+        hashes = {str(record.get(key)): row_hash(record) for record in records}
+        known = self._lookup(kind, list(hashes))
+        changed = [record for record in records if known.get(str(record.get(key))) != hashes[str(record.get(key))]]
+        return changed, {str(record.get(key)): hashes[str(record.get(key))] for record in changed}
+
+    def remember(self, kind: str, hashes: Dict[str, bytes]):
+        """Records hashes for rows that were merged successfully. Blocking."""
+        if not hashes:
+            return
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO row_hashes (kind, id, hash) VALUES (?, ?, ?)",
+                    [(kind, row_id, digest) for row_id, digest in hashes.items()],
+                )
+
+    def get_watermark(self, kind: str) -> Optional[datetime]:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM watermarks WHERE kind = ?", (kind,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def advance_watermark(self, kind: str, value: datetime):
+        """Moves the watermark forward to `value`; never moves it back. Blocking."""
+        current = self.get_watermark(kind)
+        if current is not None and current >= value:
+            return
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute("INSERT OR REPLACE INTO watermarks (kind, value) VALUES (?, ?)", (kind, value.isoformat()))
+
+
+row_hash_index = RowHashIndex(os.path.join(settings.INGEST_STATE_DIR, "row_hashes.sqlite3"))
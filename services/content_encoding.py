@@ -0,0 +1,124 @@
+# services/content_encoding.py
+"""
+Streaming Content-Encoding decoders (gzip / deflate / zstd) for ingest uploads.
+
+Output is counted against a decompressed-size cap piece by piece, so a small
+compressed body cannot expand past the body-size guard. gzip/deflate pieces are
+at most OUTPUT_PIECE bytes; zstd pieces are not bounded (see ZSTD_INPUT_PIECE).
+"""
+
+import zlib
+from typing import Iterator
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for Content-Encoding: zstd
+    zstandard = None
+
+SUPPORTED_ENCODINGS = {"identity", "gzip", "x-gzip", "deflate", "zstd"}
+OUTPUT_PIECE = 1 << 16   # Max bytes produced per zlib call
+# zstd's decompressobj has no max_length, so the cap is only checked after each input slice is
+# decoded. RLE blocks expand ~128 KiB per 4 input bytes: one slice can produce tens of MB.
+ZSTD_INPUT_PIECE = 1024
+
+
+class UnsupportedEncodingError(ValueError):
+    """The Content-Encoding is unknown, or its codec is not installed."""
+
+
+class DecompressedTooLargeError(ValueError):
+    """The decompressed body exceeded the configured limit."""
+
+
+class InvalidEncodedBodyError(ValueError):
+    """The body is not valid data for its declared Content-Encoding."""
+
+
+class BodyDecoder:
+    def __init__(self, encoding: str, max_size: int):
+        self.encoding = (encoding or "identity").strip().lower()
+        if self.encoding not in SUPPORTED_ENCODINGS:
+            raise UnsupportedEncodingError(f"Unsupported Content-Encoding: {self.encoding}")
+        if self.encoding == "zstd" and zstandard is None:
+            raise UnsupportedEncodingError("Content-Encoding zstd requires the 'zstandard' package")
+
+        self.max_size = max_size
+        self.size = 0
+        self._zstd = self._new_zstd() if self.encoding == "zstd" else None
+        self._zlib = self._new_zlib() if self.encoding in {"gzip", "x-gzip", "deflate"} else None
+
+    def _new_zlib(self):
+        # 16 + MAX_WBITS expects a gzip header; plain MAX_WBITS expects a zlib (deflate) stream
+        wbits = zlib.MAX_WBITS if self.encoding == "deflate" else 16 + zlib.MAX_WBITS
+        return zlib.decompressobj(wbits)
+
+    @staticmethod
+    def _new_zstd():
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    def _count(self, piece: bytes) -> bytes:
+        self.size += len(piece)
+        if self.size > self.max_size:
+            raise DecompressedTooLargeError(f"Decompressed body exceeds {self.max_size} bytes")
+        return piece
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        """Decodes one chunk of the request body, yielding decompressed pieces."""
+        return self._translate_errors(self._feed(chunk))
+
+    def finish(self) -> Iterator[bytes]:
+        """Flushes buffered output and checks the compressed stream was complete."""
+        return self._translate_errors(self._finish())
+
+    @staticmethod
+    def _translate_errors(pieces: Iterator[bytes]) -> Iterator[bytes]:
+        try:
+            yield from pieces
+        except zlib.error as e:
+            raise InvalidEncodedBodyError(str(e)) from e
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise InvalidEncodedBodyError(str(e)) from e
+            raise
+
+    def _feed(self, chunk: bytes) -> Iterator[bytes]:
+        if self._zlib is not None:
+            data = chunk
+            while data:
+                piece = self._zlib.decompress(data, OUTPUT_PIECE)
+                if piece:
+                    yield self._count(piece)
+                if self._zlib.eof:
+                    # Concatenated gzip members: everything after this member starts a new one
+                    data = self._zlib.unused_data
+                    if data:
+                        self._zlib = self._new_zlib()
+                else:
+                    data = self._zlib.unconsumed_tail
+        elif self._zstd is not None:
+            for start in range(0, len(chunk), ZSTD_INPUT_PIECE):
+                data = chunk[start:start + ZSTD_INPUT_PIECE]
+                while data:
+                    if self._zstd.eof:
+                        # Concatenated frames: a finished decompressobj can't be reused, start a new one
+                        self._zstd = self._new_zstd()
+                    piece = self._zstd.decompress(data)
+                    if piece:
+                        yield self._count(piece)
+                    data = self._zstd.unused_data if self._zstd.eof else b""
+        elif chunk:
+            yield self._count(chunk)
+
+    def _finish(self) -> Iterator[bytes]:
+        if self._zlib is not None:
+            piece = self._zlib.flush()
+            if piece:
+                yield self._count(piece)
+            if not self._zlib.eof:
+                raise InvalidEncodedBodyError("Truncated compressed request body")
+        elif self._zstd is not None:
+            piece = self._zstd.flush()
+            if piece:
+                yield self._count(piece)
+            if not self._zstd.eof:  # ZstdDecompressionObj.eof needs zstandard >= 0.20
+                raise InvalidEncodedBodyError("Truncated compressed request body")
@@ -12,6 +12,7 @@ import logging
 from models.models import DeviceData
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import text
+from services.http_clients import http_clients
 
 # Set up a session factory for database interactions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=secondary_async_engine)
@@ -107,14 +108,14 @@ async def generate_analytics(device_data: List[DeviceData]) -> Dict[str, dict]:
     return analytics
 
 async def handle_mytickets(data: str) -> dict:
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post("http://127.0.0.1:8001/tickets", json={"data": data})
-            response.raise_for_status()
-            tickets_result = response.json()
-            return {"response": f"Processed {len(tickets_result.get('tickets', []))} tickets"}
-        except httpx.HTTPStatusError as e:
-            return {"response": f"HTTP error: {e.response.status_code} - {str(e)}"}
+    client = http_clients.get("default")
+    try:
+        response = await client.post("http://127.0.0.1:8001/tickets", json={"data": data})
+        response.raise_for_status()
+        tickets_result = response.json()
+        return {"response": f"Processed {len(tickets_result.get('tickets', []))} tickets"}
+    except httpx.HTTPStatusError as e:
+        return {"response": f"HTTP error: {e.response.status_code} - {str(e)}"}
 
 async def count_open_tickets(tickets: List[TicketData]) -> int:
     return sum(1 for ticket in tickets if ticket.status is not None and ticket.status != 5)
@@ -125,68 +126,66 @@ async def count_open_tickets(tickets: List[TicketData]) -> int:
 
 async def update_contract_summary():
     """Ensures the ContractSummary table stays up to date."""
-    session = await get_secondary_db_connection()
-    try:
-        merge_query = text("""
-            MERGE INTO dbo.ContractSummary AS target
-            USING (
-                SELECT 
-                    c.id AS ContractID,
-                    c.contractName AS ContractName,
-                    c.companyID AS CompanyID,
-                    cl.companyName AS CompanyName,
-                    cs.id AS ServiceID,
-                    COALESCE(cs.internalDescription, 'Unknown Service') AS ServiceName,
-                    cu.startDate AS StartDate,
-                    cu.endDate AS EndDate,
-                    COALESCE(cu.units, 0) AS Units,
-                    COALESCE(cu.internalCurrencyPrice, 0) AS UnitPrice,
-                    COALESCE(cu.internalCurrencyPrice, 0) AS Cost,
-                    c.billingPreference AS BillingPreference,
-                    (COALESCE(cu.units, 0) * COALESCE(cu.internalCurrencyPrice, 0)) AS TotalRevenue,
-                    (COALESCE(cu.units, 0) * COALESCE(cu.internalCurrencyPrice, 0)) AS TotalCost
-                FROM dbo.Contracts c
-                JOIN dbo.Clients cl ON c.companyID = cl.id
-                JOIN dbo.Contract_Services cs ON c.id = cs.contractID
-                JOIN dbo.ContractUnits cu ON cs.id = cu.serviceID
-                WHERE cs.internalDescription IS NOT NULL
-            ) AS source
-            ON target.ContractID = source.ContractID AND target.ServiceID = source.ServiceID
-            WHEN MATCHED THEN
-                UPDATE SET 
-                    ContractName = source.ContractName,
-                    CompanyID = source.CompanyID,
-                    CompanyName = source.CompanyName,
-                    ServiceName = source.ServiceName,
-                    StartDate = source.StartDate,
-                    EndDate = source.EndDate,
-                    Units = source.Units,
-                    UnitPrice = source.UnitPrice,
-                    Cost = source.Cost,
-                    BillingPreference = source.BillingPreference,
-                    TotalRevenue = source.TotalRevenue,
-                    TotalCost = source.TotalCost,
-                    LastUpdated = GETDATE()
-            WHEN NOT MATCHED THEN
-                INSERT (
-                    ContractID, ContractName, CompanyID, CompanyName, ServiceID, ServiceName, StartDate, EndDate, Units, 
-                    UnitPrice, Cost, BillingPreference, TotalRevenue, TotalCost
-                )
-                VALUES (
-                    source.ContractID, source.ContractName, source.CompanyID, source.CompanyName, source.ServiceID, 
-                    source.ServiceName, source.StartDate, source.EndDate, source.Units, source.UnitPrice, 
-                    source.Cost, source.BillingPreference, source.TotalRevenue, source.TotalCost
-                );
-        """)
-
-        session.execute(merge_query)
-        session.commit()
-        logger.info("✅ ContractSummary table updated successfully.")
-    except Exception as e:
-        session.rollback()
-        logger.error(f"❌ Error updating ContractSummary table: {e}")
-    finally:
-        session.close()
+    async with get_secondary_db_connection() as session:
+        try:
+            merge_query = text("""
+                MERGE INTO dbo.ContractSummary AS target
+                USING (
+                    SELECT 
+                        c.id AS ContractID,
+                        c.contractName AS ContractName,
+                        c.companyID AS CompanyID,
+                        cl.companyName AS CompanyName,
+                        cs.id AS ServiceID,
+                        COALESCE(cs.internalDescription, 'Unknown Service') AS ServiceName,
+                        cu.startDate AS StartDate,
+                        cu.endDate AS EndDate,
+                        COALESCE(cu.units, 0) AS Units,
+                        COALESCE(cu.internalCurrencyPrice, 0) AS UnitPrice,
+                        COALESCE(cu.internalCurrencyPrice, 0) AS Cost,
+                        c.billingPreference AS BillingPreference,
+                        (COALESCE(cu.units, 0) * COALESCE(cu.internalCurrencyPrice, 0)) AS TotalRevenue,
+                        (COALESCE(cu.units, 0) * COALESCE(cu.internalCurrencyPrice, 0)) AS TotalCost
+                    FROM dbo.Contracts c
+                    JOIN dbo.Clients cl ON c.companyID = cl.id
+                    JOIN dbo.Contract_Services cs ON c.id = cs.contractID
+                    JOIN dbo.ContractUnits cu ON cs.id = cu.serviceID
+                    WHERE cs.internalDescription IS NOT NULL
+                ) AS source
+                ON target.ContractID = source.ContractID AND target.ServiceID = source.ServiceID
+                WHEN MATCHED THEN
+                    UPDATE SET 
+                        ContractName = source.ContractName,
+                        CompanyID = source.CompanyID,
+                        CompanyName = source.CompanyName,
+                        ServiceName = source.ServiceName,
+                        StartDate = source.StartDate,
+                        EndDate = source.EndDate,
+                        Units = source.Units,
+                        UnitPrice = source.UnitPrice,
+                        Cost = source.Cost,
+                        BillingPreference = source.BillingPreference,
+                        TotalRevenue = source.TotalRevenue,
+                        TotalCost = source.TotalCost,
+                        LastUpdated = GETDATE()
+                WHEN NOT MATCHED THEN
+                    INSERT (
+                        ContractID, ContractName, CompanyID, CompanyName, ServiceID, ServiceName, StartDate, EndDate, Units, 
+                        UnitPrice, Cost, BillingPreference, TotalRevenue, TotalCost
+                    )
+                    VALUES (
+                        source.ContractID, source.ContractName, source.CompanyID, source.CompanyName, source.ServiceID, 
+                        source.ServiceName, source.StartDate, source.EndDate, source.Units, source.UnitPrice, 
+                        source.Cost, source.BillingPreference, source.TotalRevenue, source.TotalCost
+                    );
+            """)
+
+            await session.execute(merge_query)
+            await session.commit()
+            logger.info("✅ ContractSummary table updated successfully.")
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"❌ Error updating ContractSummary table: {e}")
 
 
 # ✅ Fetch Contract Data & Ticket Counts
@@ -364,12 +363,12 @@ async def download_teams_file(content_url: str, bearer_token: str,
     filename  = f"teams_policy_{uuid.uuid4()}.pdf"
     dst_path  = os.path.join(dst_dir, filename)
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(content_url,
-                             headers={"Authorization": f"Bearer {bearer_token}"})
-        r.raise_for_status()
-        with open(dst_path, "wb") as f:
-            f.write(r.content)
+    client = http_clients.get("teams")
+    r = await client.get(content_url,
+                         headers={"Authorization": f"Bearer {bearer_token}"})
+    r.raise_for_status()
+    with open(dst_path, "wb") as f:
+        f.write(r.content)
 
     logging.info(f"📥  Saved Teams attachment → {dst_path}")
     return dst_path
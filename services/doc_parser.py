@@ -1,37 +1,109 @@
 # services/doc_parser.py
 """
 Minimal PDF-→OpenAI→JSON extractor + DB persister
-Fits your existing env vars (openai.api_* already set elsewhere).
+OpenAI calls go through services.openai_gateway (policy deployment).
 """
 
-import json, logging, uuid, pdfplumber, os
+import asyncio, json, logging, re, uuid, os
 from datetime import datetime
 from typing import List, Dict
 
-from azure_openai import query_openai, secondary_query_openai
-from config    import get_db_connection     # <-- you already have this
+from config    import get_db_connection, settings
+from services.openai_gateway import openai_gateway
+from services.tokens import count_tokens, split_text
+from services.pdf_extraction import extract_pdf_text
 
-# ----------------------------- TEXT EXTRACTION ------------------------------
-def _extract_text(path: str) -> str:
-    text = ""
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
-    return text
+# ----------------------------- CHUNKING -------------------------------------
+# Lines that open a new policy section: "SECTION IV", "Article 3", "2.1 Exclusions", "IV. Conditions",
+# or a short all-caps heading such as "DEFINITIONS"
+_KEYWORD_HEADING = re.compile(r"^(?:section|article|part|endorsement|schedule)\s+(?:\d+|[IVXLC]+|[A-Z])\b", re.IGNORECASE)
+_NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*|[IVXLC]+)[.)]?\s+[A-Z]")
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z0-9 ,&/'()\-]{3,80}$")
 
-def _chunk(text: str, max_len: int = 6000) -> List[str]:
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 100:
+        return False
+    if _KEYWORD_HEADING.match(stripped) or _CAPS_HEADING.match(stripped):
+        return True
+    return bool(_NUMBERED_HEADING.match(stripped)) and len(stripped) <= 80 and not stripped.endswith((".", ",", ";", ":"))
+
+
+def _sections(text: str) -> List[List[str]]:
+    sections, current = [], []
+    for line in text.splitlines():
+        if _is_heading(line) and current:
+            sections.append(current)
+            current = []
+        current.append(line)
+    if current:
+        sections.append(current)
+    return sections
+
+
+def _chunk(text: str, max_tokens: int = None, overlap_tokens: int = None) -> List[str]:
     """
-    Azure GPT-4o has an 8k token limit; quick char-based chunker is enough
-    for typical 20-30 page policies.
+    Token-budgeted chunker. Whole sections are packed together up to `max_tokens`;
+    a section that is too big on its own is split on lines, and each continuation
+    repeats the last `overlap_tokens` of the previous piece so no clause loses its context.
+    A single line over budget (PDF text without line breaks) is cut on token boundaries.
     """
-    parts, buf = [], ""
-    for line in text.splitlines():
-        if len(buf) + len(line) > max_len:
-            parts.append(buf)
-            buf = ""
-        buf += line + "\n"
-    if buf:
-        parts.append(buf)
+    max_tokens = max_tokens or settings.POLICY_CHUNK_TOKENS
+    overlap_tokens = settings.POLICY_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+
+    parts: List[str] = []
+    buf: List[str] = []
+    buf_tokens = 0
+
+    def flush():
+        nonlocal buf, buf_tokens
+        if any(line.strip() for line in buf):
+            parts.append("\n".join(buf) + "\n")
+        buf, buf_tokens = [], 0
+
+    for section in _sections(text):
+        counted = [(line, count_tokens(line) + 1) for line in section]
+        section_tokens = sum(tokens for _, tokens in counted)
+
+        if buf_tokens + section_tokens <= max_tokens:
+            buf.extend(line for line, _ in counted)
+            buf_tokens += section_tokens
+            continue
+
+        flush()
+        if section_tokens <= max_tokens:
+            buf.extend(line for line, _ in counted)
+            buf_tokens = section_tokens
+            continue
+
+        # Oversized section: split on lines with overlap between consecutive pieces
+        piece: List[tuple] = []
+        piece_tokens = 0
+        for line, tokens in counted:
+            if tokens > max_tokens:
+                windows = split_text("\n".join([l for l, _ in piece] + [line]), max_tokens - 1, overlap_tokens)
+                parts.extend(window + "\n" for window in windows[:-1])
+                # The last window starts the next piece, so following lines still get packed after it
+                piece = [(windows[-1], count_tokens(windows[-1]) + 1)]
+                piece_tokens = piece[0][1]
+                continue
+            if piece and piece_tokens + tokens > max_tokens:
+                parts.append("\n".join(l for l, _ in piece) + "\n")
+                # Carry only as much overlap as fits beside this line, so the new piece stays within budget
+                carry_budget = min(overlap_tokens, max_tokens - tokens)
+                carried, carried_tokens = [], 0
+                for previous in reversed(piece):
+                    if carried_tokens + previous[1] > carry_budget:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous[1]
+                piece, piece_tokens = carried, carried_tokens
+            piece.append((line, tokens))
+            piece_tokens += tokens
+        buf = [l for l, _ in piece]
+        buf_tokens = piece_tokens
+    flush()
     return parts
 
 # ----------------------------- OPENAI CALL ----------------------------------
@@ -41,24 +113,45 @@ SYSTEM_PROMPT = (
     "each having keys 'requirement' and optional 'category'."
 )
 
-async def extract_requirements(pdf_path: str) -> List[Dict[str, str]]:
-    text   = _extract_text(pdf_path)
-    chunks = _chunk(text)
-
-    reqs: List[Dict[str, str]] = []
-    for chunk in chunks:
-        resp = await secondary_query_openai(
+async def _extract_chunk(chunk: str, index: int, semaphore: asyncio.Semaphore) -> List[Dict[str, str]]:
+    async with semaphore:
+        resp = await openai_gateway.complete(
             [
                 {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user",   "content": chunk},
             ],
             max_tokens=800,
             temperature=0,
+            deployment=settings.POLICY_DEPLOYMENT_NAME,
         )
-        try:
-            reqs.extend(json.loads(resp))
-        except json.JSONDecodeError as e:
-            logging.error(f"❌ JSON parse error in chunk: {e}\n{resp[:400]}")
+    try:
+        return json.loads(resp)
+    except json.JSONDecodeError as e:
+        logging.error(f"❌ JSON parse error in chunk {index}: {e}\n{resp[:400]}")
+        return []
+
+
+async def extract_requirements(pdf_path: str) -> List[Dict[str, str]]:
+    """
+    Extracts requirements from every chunk concurrently (POLICY_EXTRACT_CONCURRENCY at a time)
+    and merges them in document order. Clauses repeated by chunk overlap are kept once.
+    """
+    text   = await extract_pdf_text(pdf_path)
+    chunks = _chunk(text)
+    logging.info(f"📄 {os.path.basename(pdf_path)}: {len(chunks)} chunks for requirement extraction.")
+
+    semaphore = asyncio.Semaphore(settings.POLICY_EXTRACT_CONCURRENCY)
+    results = await asyncio.gather(*(_extract_chunk(chunk, i, semaphore) for i, chunk in enumerate(chunks, 1)))
+
+    reqs: List[Dict[str, str]] = []
+    seen = set()
+    for chunk_reqs in results:
+        for req in chunk_reqs if isinstance(chunk_reqs, list) else []:
+            key = " ".join(str(req.get("requirement", "")).lower().split()) if isinstance(req, dict) else None
+            if key is None or key in seen:
+                continue
+            seen.add(key)
+            reqs.append(req)
     return reqs
 
 # ----------------------------- DB PERSIST -----------------------------------
@@ -1,7 +1,8 @@
+import asyncio
 from msal import ConfidentialClientApplication
-import requests
 import base64
 from config import settings
+from services.http_clients import http_clients
 
 async def get_access_token():
     app = ConfidentialClientApplication(
@@ -9,11 +10,12 @@ async def get_access_token():
         authority=f"https://login.microsoftonline.com/{settings.TENANT_ID}",
         client_credential=settings.CLIENT_SECRET
     )
-    result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
+    # MSAL is synchronous; keep its token request off the event loop
+    result = await asyncio.to_thread(app.acquire_token_for_client, scopes=["https://graph.microsoft.com/.default"])
     return result.get("access_token")
 
 async def send_email_with_pdf(to_address: str, pdf_path: str):
-    access_token = get_access_token()
+    access_token = await get_access_token()
 
     with open(pdf_path, "rb") as f:
         pdf_content = base64.b64encode(f.read()).decode("utf-8")
@@ -40,7 +42,7 @@ async def send_email_with_pdf(to_address: str, pdf_path: str):
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
     }
-    response = requests.post(
+    response = await http_clients.get("graph").post(
         "https://graph.microsoft.com/v1.0/me/sendMail",
         headers=headers,
         json=email_data
@@ -0,0 +1,67 @@
+# services/http_clients.py
+"""
+Shared, pooled httpx clients for outbound calls.
+
+One AsyncClient per upstream keeps its own connection limits and keep-alive
+pool, so repeated calls reuse warm TCP/TLS connections instead of handshaking
+every time. HTTP/2 is negotiated (via ALPN) when the optional `h2` package is
+installed; hosts that don't speak it fall back to HTTP/1.1.
+
+Clients are created lazily on first use and closed by the app's shutdown hook.
+"""
+
+import importlib.util
+import logging
+from typing import Dict
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# name -> (max connections, max keep-alive connections, default timeout in seconds)
+UPSTREAMS = {
+    "default": (50, 10, 30),
+    "login": (10, 5, 15),      # login.microsoftonline.com / login.botframework.com
+    "teams": (50, 20, 30),     # Bot Framework connector (serviceUrl) and Teams attachments
+    "graph": (10, 5, 30),      # graph.microsoft.com
+    "openai": (20, 10, 120),   # Azure OpenAI
+    "rewst": (10, 5, 300),     # Rewst webhooks (ticket lookups can take minutes)
+}
+KEEPALIVE_EXPIRY = 60
+
+
+class HttpClients:
+    def __init__(self, upstreams: Dict[str, tuple] = None):
+        self.upstreams = upstreams or UPSTREAMS
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, name: str = "default") -> httpx.AsyncClient:
+        """Returns the pooled client for an upstream, creating it on first use."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            max_connections, max_keepalive, timeout = self.upstreams.get(name, self.upstreams["default"])
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._clients[name] = client
+        return client
+
+    async def start(self):
+        for name in self.upstreams:
+            self.get(name)
+        logging.info(f"🌐 HTTP client pools ready ({len(self._clients)} upstreams, HTTP/2 {'on' if HTTP2_AVAILABLE else 'off'}).")
+
+    async def close(self):
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+        logging.info("🌐 HTTP client pools closed.")
+
+
+http_clients = HttpClients()
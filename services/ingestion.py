@@ -0,0 +1,233 @@
+# services/ingestion.py
+"""
+Autotask → secondary DB ingest pipelines used by the /process_* endpoints.
+Rows are mapped to table columns here and written through services.bulk_upsert.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import AsyncIterable, List, Dict, Optional, Callable, Tuple, get_args
+
+from pydantic import TypeAdapter, ValidationError
+
+from models.models import Contract, TicketData
+
+from services.bulk_upsert import merge_rows, dedupe_by_key
+from services.change_detection import row_hash_index
+from services.timestamps import parse_record_dates
+
+TIME_ENTRY_COLUMNS = [
+    "id", "contractID", "contractServiceBundleID", "contractServiceID", "createDateTime",
+    "creatorUserID", "dateWorked", "endDateTime", "hoursToBill", "hoursWorked",
+    "internalNotes", "isNonBillable", "lastModifiedDateTime", "resourceID", "roleID",
+    "startDateTime", "summaryNotes", "taskID", "ticketID", "timeEntryType",
+]
+
+CONTRACT_UNIT_COLUMNS = [
+    "id", "contractID", "serviceID", "startDate", "endDate", "approveAndPostDate",
+    "unitCost", "unitPrice", "internalCurrencyPrice", "organizationalLevelAssociationID",
+    "invoiceDescription", "units",
+]
+
+# Every scalar model field maps 1:1 onto a column of the same name
+CONTRACT_COLUMNS = [name for name in Contract.model_fields if name != "userDefinedFields"]
+TICKET_COLUMNS = [name for name in TicketData.model_fields if name != "userDefinedFields"]
+
+# (records) -> (rows ready for the MERGE, number of records rejected)
+BatchMapper = Callable[[List[Dict]], Tuple[List[Dict], int]]
+
+
+TIME_ENTRY_DATE_FIELDS = ["createDateTime", "dateWorked", "endDateTime", "lastModifiedDateTime", "startDateTime"]
+CONTRACT_UNIT_DATE_FIELDS = ["startDate", "endDate", "approveAndPostDate"]
+
+
+def map_time_entries(entries: List[Dict]) -> Tuple[List[Dict], int]:
+    """Maps Autotask time entries onto dbo.TimeEntries columns, parsing each date column in one pass."""
+    dates = parse_record_dates(entries, TIME_ENTRY_DATE_FIELDS)
+    now = datetime.utcnow()
+    rows = []
+    for i, entry in enumerate(entries):
+        row = {column: entry.get(column) for column in TIME_ENTRY_COLUMNS}
+        row.update({field: dates[field][i] for field in TIME_ENTRY_DATE_FIELDS})
+        if row["contractID"] is None:
+            row["contractID"] = 0  # ✅ contractID is NEVER NULL
+        if row["lastModifiedDateTime"] is None:
+            row["lastModifiedDateTime"] = now
+        rows.append(row)
+    return rows, 0
+
+
+def map_contract_units(units: List[Dict]) -> Tuple[List[Dict], int]:
+    """Maps Autotask contract units onto dbo.ContractUnits columns, parsing each date column in one pass."""
+    dates = parse_record_dates(units, CONTRACT_UNIT_DATE_FIELDS)
+    rows = []
+    for i, unit in enumerate(units):
+        rows.append({
+            "id": unit.get("id"),
+            "contractID": unit.get("contractID"),
+            "serviceID": unit.get("serviceID"),
+            "startDate": dates["startDate"][i],
+            "endDate": dates["endDate"][i],
+            "approveAndPostDate": dates["approveAndPostDate"][i],
+            "unitCost": unit.get("unitCost", 0),
+            "unitPrice": unit.get("unitPrice", 0),
+            "internalCurrencyPrice": unit.get("internalCurrencyPrice", 0),
+            "organizationalLevelAssociationID": unit.get("organizationalLevelAssociationID"),
+            "invoiceDescription": unit.get("invoiceDescription", ""),
+            "units": unit.get("units", 0),
+        })
+    return rows, 0
+
+
+def summarize(kind: str, batches: List[Dict], started: float, duplicates: int = 0) -> Dict:
+    """Rolls per-batch results up into one job summary and logs it."""
+    elapsed = time.perf_counter() - started
+    succeeded = sum(b["succeeded"] for b in batches)
+    failed = sum(b["failed"] for b in batches)
+    skipped = sum(b.get("skipped", 0) for b in batches)
+    processed = succeeded + failed + skipped
+    summary = {
+        "kind": kind,
+        "rows": processed,
+        "succeeded": succeeded,
+        "failed": failed,
+        "skipped_unchanged": skipped,
+        "duplicates_collapsed": duplicates,
+        "batches": batches,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(processed / elapsed, 1) if elapsed > 0 else None,
+    }
+    logging.info(
+        f"🎯 {kind}: {succeeded} rows merged, {skipped} unchanged skipped, {failed} failed in {len(batches)} batches "
+        f"({summary['elapsed_seconds']}s, {summary['rows_per_second']} rows/s)."
+    )
+    return summary
+
+
+def map_validated(model, columns: List[str]) -> BatchMapper:
+    """
+    Builds a batch mapper that validates a whole batch against `model` in one call and
+    maps it onto `columns`. Date fields are parsed column-wise before validation.
+    Records that fail validation are logged and rejected.
+    """
+    adapter = TypeAdapter(List[model])
+    include = set(columns)
+    date_fields = [
+        name for name, field in model.model_fields.items()
+        if field.annotation is datetime or datetime in get_args(field.annotation)
+    ]
+
+    def map_rows(records: List[Dict]) -> Tuple[List[Dict], int]:
+        # Parse every date column up front; unparseable strings are left for the validators to reject
+        dates = parse_record_dates(records, date_fields)
+        records = [
+            {**record, **{field: dates[field][i] for field in date_fields if dates[field][i] is not None}}
+            for i, record in enumerate(records)
+        ]
+        try:
+            items = adapter.validate_python(records)
+            rejected = 0
+        except ValidationError as e:
+            bad = {error["loc"][0] for error in e.errors() if error["loc"]}
+            logging.error(f"❌ {len(bad)} {model.__name__} records failed validation: {e.errors()[:5]}")
+            items = adapter.validate_python([r for i, r in enumerate(records) if i not in bad])
+            rejected = len(bad)
+        return [item.model_dump(include=include) for item in items], rejected
+
+    return map_rows
+
+
+async def ingest_batches(kind: str, table: str, columns: List[str], map_rows: BatchMapper,
+                         batches: AsyncIterable[List[Dict]],
+                         on_batch: Optional[Callable[[Dict], None]] = None,
+                         detect_changes: bool = True,
+                         on_merged: Optional[Callable[[List[Dict]], None]] = None) -> Dict:
+    """
+    Dedupes, filters unchanged rows, maps and MERGEs each incoming batch as soon as it arrives.
+    Duplicate ids inside a batch collapse to the last one sent; duplicates across
+    batches are resolved by MERGE order, so the last write wins either way.
+    With `detect_changes`, rows whose content hash matches the last merged version are skipped.
+    `on_merged` runs in a worker thread with the mapped rows of every batch that committed.
+    """
+    started = time.perf_counter()
+    results, duplicates, index = [], 0, 0
+    async for raw in batches:
+        index += 1
+        records = dedupe_by_key(raw, "id")
+        if len(records) < len(raw):
+            logging.info(f"🧹 {kind} batch {index}: collapsed {len(raw) - len(records)} duplicate ids.")
+        duplicates += len(raw) - len(records)
+
+        hashes = {}
+        if detect_changes:
+            changed, hashes = await asyncio.to_thread(row_hash_index.filter_changed, kind, records)
+        else:
+            changed = records
+        skipped = len(records) - len(changed)
+
+        rows, rejected = await asyncio.to_thread(map_rows, changed) if changed else ([], 0)
+        if rows:
+            result = await merge_rows(table, "id", columns, rows, index)
+            if result["succeeded"] and on_merged is not None:
+                await asyncio.to_thread(on_merged, rows)
+            if result["succeeded"] and hashes:
+                merged_ids = {str(row["id"]) for row in rows}
+                await asyncio.to_thread(row_hash_index.remember, kind,
+                                        {row_id: h for row_id, h in hashes.items() if row_id in merged_ids})
+        else:
+            result = {"batch": index, "rows": 0, "succeeded": 0, "failed": 0, "affected": 0}
+        result["rows"] += rejected
+        result["failed"] += rejected
+        result["skipped"] = skipped
+        if skipped:
+            logging.info(f"⏭️ {kind} batch {index}: {skipped} unchanged rows skipped.")
+
+        results.append(result)
+        if on_batch is not None:
+            on_batch(result)
+    return summarize(kind, results, started, duplicates=duplicates)
+
+
+async def ingest_time_entries(batches: AsyncIterable[List[Dict]],
+                              on_batch: Optional[Callable[[Dict], None]] = None,
+                              detect_changes: bool = True) -> Dict:
+    """Bulk upserts time entries into dbo.TimeEntries, one staging-table MERGE per batch."""
+    return await ingest_batches("time_entries", "dbo.TimeEntries", TIME_ENTRY_COLUMNS, map_time_entries,
+                                batches, on_batch, detect_changes)
+
+
+async def ingest_contract_units(batches: AsyncIterable[List[Dict]],
+                                on_batch: Optional[Callable[[Dict], None]] = None,
+                                detect_changes: bool = True) -> Dict:
+    """Bulk upserts contract units into dbo.ContractUnits, one staging-table MERGE per chunk."""
+    return await ingest_batches("contract_units", "dbo.ContractUnits", CONTRACT_UNIT_COLUMNS, map_contract_units,
+                                batches, on_batch, detect_changes)
+
+
+async def ingest_contracts(batches: AsyncIterable[List[Dict]],
+                           on_batch: Optional[Callable[[Dict], None]] = None,
+                           detect_changes: bool = True) -> Dict:
+    """Validates contracts batch-wise and bulk upserts them into dbo.Contracts."""
+    return await ingest_batches("contracts", "dbo.Contracts", CONTRACT_COLUMNS,
+                                map_validated(Contract, CONTRACT_COLUMNS), batches, on_batch, detect_changes)
+
+
+async def ingest_tickets(batches: AsyncIterable[List[Dict]],
+                         on_batch: Optional[Callable[[Dict], None]] = None,
+                         detect_changes: bool = True) -> Dict:
+    """
+    Validates tickets batch-wise, bulk upserts them into dbo.tickets and advances the
+    lastActivityDate watermark over every ticket that was merged.
+    """
+    def advance_watermark(rows: List[Dict]):
+        latest = max((row["lastActivityDate"] for row in rows if row.get("lastActivityDate")), default=None)
+        if latest is not None:
+            row_hash_index.advance_watermark("tickets", latest)
+
+    summary = await ingest_batches("tickets", "dbo.tickets", TICKET_COLUMNS,
+                                   map_validated(TicketData, TICKET_COLUMNS), batches, on_batch, detect_changes,
+                                   on_merged=advance_watermark)
+    summary["watermark"] = row_hash_index.get_watermark("tickets")
+    return summary
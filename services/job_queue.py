@@ -0,0 +1,356 @@
+# services/job_queue.py
+"""
+Durable local ingest queue (SQLite + spooled payload files).
+
+POSTs to the /process_* endpoints spool their payload to disk and enqueue a
+job; a bounded pool of asyncio workers drains the queue. Jobs left "running"
+by a crash or restart are re-queued on startup, so a payload is never lost once
+the POST has returned its job id. Assumes one process owns the state directory.
+
+Idempotency keys (from the Idempotency-Key header or a hash of the body) map
+retried webhook deliveries back to the job created by the first delivery.
+The key store is bounded by age and count.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import settings
+
+
+class QueueFullError(Exception):
+    """Raised when the number of pending jobs reaches the configured limit."""
+
+
+class JobProgress:
+    """Handed to job handlers so they can report row counts as batches complete."""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.rows_total: Optional[int] = None
+        self.rows_done = 0
+        self.rows_failed = 0
+        self.rows_skipped = 0
+        self.batches_done = 0
+
+    def set_total(self, rows_total: int):
+        self.rows_total = rows_total
+        self._flush()
+
+    def add_batch(self, batch: Dict):
+        """Accepts a services.bulk_upsert batch result dict."""
+        self.rows_done += batch.get("succeeded", 0)
+        self.rows_failed += batch.get("failed", 0)
+        self.rows_skipped += batch.get("skipped", 0)
+        self.batches_done += 1
+        self._flush()
+
+    def _flush(self):
+        self.queue._update(
+            self.job_id,
+            rows_total=self.rows_total,
+            rows_done=self.rows_done,
+            rows_failed=self.rows_failed,
+            rows_skipped=self.rows_skipped,
+            batches_done=self.batches_done,
+        )
+
+
+# handler(job, progress) -> summary; `job` has payload_path, content_type and options
+JobHandler = Callable[[Dict, JobProgress], Awaitable[Dict]]
+
+
+class JobQueue:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            payload_path TEXT NOT NULL,
+            content_type TEXT NOT NULL,
+            options TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            rows_total INTEGER,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            rows_failed INTEGER NOT NULL DEFAULT 0,
+            rows_skipped INTEGER NOT NULL DEFAULT 0,
+            batches_done INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            summary TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at);
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            job_id TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (kind, key)
+        );
+        CREATE INDEX IF NOT EXISTS ix_idempotency_created ON idempotency_keys (created_at);
+    """
+    # Columns added after the first release; created on existing queue files at startup
+    ADDED_COLUMNS = {
+        "rows_skipped": "INTEGER NOT NULL DEFAULT 0",
+    }
+
+    def __init__(self, state_dir: str, workers: int, max_pending: int, retention_days: int = 7,
+                 idempotency_ttl_hours: int = 24, idempotency_max_keys: int = 10000):
+        self.state_dir = state_dir
+        self.spool_dir = os.path.join(state_dir, "spool")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_days * 86400
+        self.idempotency_ttl_seconds = idempotency_ttl_hours * 3600
+        self.idempotency_max_keys = idempotency_max_keys
+        self.handlers: Dict[str, JobHandler] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = []
+
+    # ----------------------------- storage ---------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._db = sqlite3.connect(
+                os.path.join(self.state_dir, "jobs.sqlite3"),
+                check_same_thread=False,
+                isolation_level=None,  # autocommit; explicit BEGIN where needed
+            )
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(self.SCHEMA)
+            existing = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for column, ddl in self.ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {ddl}")
+        return self._db
+
+    def _update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def spool_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.payload")
+
+    # ----------------------------- producer side ---------------------------
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    def pending_count(self) -> int:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()
+        return row[0]
+
+    def new_job_id(self) -> str:
+        """Reserves nothing, but fails fast when the queue is already full (backpressure)."""
+        if self.pending_count() >= self.max_pending:
+            raise QueueFullError(f"{self.max_pending} ingest jobs already pending")
+        return str(uuid.uuid4())
+
+    def _find_idempotent(self, db: sqlite3.Connection, kind: str, key: str) -> Optional[str]:
+        # Failed jobs don't count: a retry of a delivery that failed should run again
+        row = db.execute(
+            "SELECT k.job_id FROM idempotency_keys k JOIN jobs j ON j.id = k.job_id "
+            "WHERE k.kind = ? AND k.key = ? AND k.created_at >= ? AND j.status != 'failed'",
+            (kind, key, time.time() - self.idempotency_ttl_seconds),
+        ).fetchone()
+        return row["job_id"] if row else None
+
+    def find_idempotent(self, kind: str, key: str) -> Optional[str]:
+        """Returns the job already created for this idempotency key, if it is still remembered."""
+        with self._lock:
+            return self._find_idempotent(self._connect(), kind, key)
+
+    def _prune_idempotency_keys(self, db: sqlite3.Connection):
+        db.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (time.time() - self.idempotency_ttl_seconds,))
+        db.execute(
+            "DELETE FROM idempotency_keys WHERE rowid IN "
+            "(SELECT rowid FROM idempotency_keys ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.idempotency_max_keys,),
+        )
+
+    def enqueue_spooled(self, job_id: str, kind: str, content_type: str = "application/json",
+                        options: Optional[Dict] = None, idempotency_key: Optional[str] = None) -> str:
+        """
+        Enqueues a job whose payload has already been written to `spool_path(job_id)`.
+        Returns the id of the job that owns the payload: when `idempotency_key` was already
+        seen for this kind, that earlier job's id is returned and nothing new is queued.
+        """
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._find_idempotent(db, kind, idempotency_key) if idempotency_key else None
+                if existing is None:
+                    now = time.time()
+                    db.execute(
+                        "INSERT INTO jobs (id, kind, status, payload_path, content_type, options, created_at) "
+                        "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                        (job_id, kind, self.spool_path(job_id), content_type, json.dumps(options or {}), now),
+                    )
+                    if idempotency_key:
+                        db.execute(
+                            "INSERT OR REPLACE INTO idempotency_keys (kind, key, job_id, created_at) VALUES (?, ?, ?, ?)",
+                            (kind, idempotency_key, job_id, now),
+                        )
+                        self._prune_idempotency_keys(db)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        if existing is not None:
+            logging.info(f"🔁 Duplicate {kind} delivery matches job {existing}; not queued again.")
+            return existing
+
+        logging.info(f"📥 Queued {kind} job {job_id}.")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        end = job["finished_at"] or time.time()
+        elapsed = end - job["started_at"] if job["started_at"] else None
+        processed = job["rows_done"] + job["rows_failed"] + job["rows_skipped"]
+        as_iso = lambda ts: datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+        return {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "created_at": as_iso(job["created_at"]),
+            "started_at": as_iso(job["started_at"]),
+            "finished_at": as_iso(job["finished_at"]),
+            "rows_total": job["rows_total"],
+            "rows_done": job["rows_done"],
+            "rows_failed": job["rows_failed"],
+            "rows_skipped": job["rows_skipped"],
+            "batches_done": job["batches_done"],
+            "progress": round(processed / job["rows_total"], 4) if job["rows_total"] else None,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "rows_per_second": round(processed / elapsed, 1) if elapsed else None,
+            "error": job["error"],
+            "summary": json.loads(job["summary"]) if job["summary"] else None,
+        }
+
+    # ----------------------------- worker side -----------------------------
+    def _claim(self) -> Optional[Dict]:
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT id, kind, payload_path, content_type, options FROM jobs "
+                    "WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                        (time.time(), row["id"]),
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"] or "{}")
+        return job
+
+    async def _run(self, job: Dict):
+        job_id, kind = job["id"], job["kind"]
+        handler = self.handlers.get(kind)
+        progress = JobProgress(self, job_id)
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind '{kind}'")
+            logging.info(f"🚚 Running {kind} job {job_id}...")
+            summary = await handler(job, progress)
+            self._update(job_id, status="succeeded", finished_at=time.time(),
+                         summary=json.dumps(summary, default=str))
+            logging.info(f"✅ {kind} job {job_id} finished.")
+        except asyncio.CancelledError:
+            # Shutdown mid-job: leave it 'running' so the next start re-queues it
+            raise
+        except Exception as e:
+            logging.critical(f"🔥 {kind} job {job_id} failed: {e}", exc_info=True)
+            self._update(job_id, status="failed", finished_at=time.time(), error=str(e))
+        else:
+            try:
+                os.remove(job["payload_path"])
+            except OSError:
+                pass
+
+    async def _worker(self, number: int):
+        logging.info(f"👷 Ingest worker {number} started.")
+        while True:
+            job = self._claim()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    def _recover(self):
+        """Re-queues jobs interrupted by a restart and prunes old finished jobs."""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            db = self._connect()
+            requeued = db.execute((
+                "UPDATE jobs SET status = 'queued', started_at = NULL, rows_done = 0, rows_failed = 0, "
+                "rows_skipped = 0, batches_done = 0 WHERE status = 'running'"
+            )).rowcount
+            stale = db.execute(
+                "SELECT payload_path FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (cutoff,)
+            ).fetchall()
+            db.execute("DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (cutoff,))
+            self._prune_idempotency_keys(db)
+        for row in stale:
+            if os.path.exists(row["payload_path"]):
+                os.remove(row["payload_path"])
+        if requeued:
+            logging.warning(f"♻️ Re-queued {requeued} ingest job(s) interrupted by a restart.")
+
+    async def start(self):
+        self._recover()
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(1, self.workers + 1)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+job_queue = JobQueue(
+    state_dir=settings.INGEST_STATE_DIR,
+    workers=settings.INGEST_WORKERS,
+    max_pending=settings.INGEST_MAX_PENDING_JOBS,
+    idempotency_ttl_hours=settings.INGEST_IDEMPOTENCY_TTL_HOURS,
+    idempotency_max_keys=settings.INGEST_IDEMPOTENCY_MAX_KEYS,
+)
@@ -0,0 +1,128 @@
+# services/json_stream.py
+"""
+Incremental readers for spooled ingest payloads.
+
+Accepts either a top-level JSON array of objects or NDJSON (one object per
+line) and yields fixed-size batches, so memory stays flat no matter how large
+the upload is.
+"""
+
+import asyncio
+import codecs
+import json
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List
+
+READ_SIZE = 1 << 16
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(fp: BinaryIO, read_size: int = READ_SIZE) -> Iterator:
+    """Yields the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = "", 0, False
+
+    def more():
+        nonlocal buf, pos, eof
+        chunk = fp.read(read_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            more()
+
+    def expect_end():
+        nonlocal pos
+        pos += 1  # The closing "]"
+        skip_whitespace()
+        if pos < len(buf):
+            raise ValueError(f"Unexpected data after JSON array: {buf[pos:pos + 20]!r}")
+
+    skip_whitespace()
+    if pos >= len(buf):
+        return  # Empty body
+    if buf[pos] != "[":
+        raise ValueError("Expected a JSON array of objects")
+    pos += 1
+
+    skip_whitespace()
+    if buf.startswith("]", pos):
+        expect_end()
+        return
+
+    while True:
+        skip_whitespace()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more()
+                continue
+            # A scalar that ends exactly at the buffer edge may be truncated ("12" of "123")
+            if end == len(buf) and not eof:
+                more()
+                continue
+            break
+        yield item
+        pos = end
+
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of JSON array")
+        separator = buf[pos]
+        if separator == "]":
+            expect_end()
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {separator!r}")
+        pos += 1
+
+
+def iter_ndjson(fp: BinaryIO) -> Iterator:
+    """Yields one parsed value per non-blank line."""
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(fp: BinaryIO, content_type: str) -> Iterator[Dict]:
+    """Yields JSON objects from a payload in either supported format."""
+    items = iter_ndjson(fp) if content_type in NDJSON_CONTENT_TYPES else iter_json_array(fp)
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError(f"Expected JSON objects, got {type(item).__name__}")
+        yield item
+
+
+def iter_batches(fp: BinaryIO, content_type: str, batch_size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for record in iter_records(fp, content_type):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def aiter_batches(path: str, content_type: str, batch_size: int) -> AsyncIterator[List[Dict]]:
+    """Reads a spooled payload in batches, parsing each batch in a worker thread."""
+    with open(path, "rb") as fp:
+        batches = iter_batches(fp, content_type, batch_size)
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                return
+            yield batch
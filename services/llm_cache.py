@@ -0,0 +1,139 @@
+# services/llm_cache.py
+"""
+Persistent, content-addressed cache of Azure OpenAI chat completions.
+
+Entries are keyed on a hash of (deployment, messages, parameters) and kept in
+a local SQLite file, evicted by age (TTL) and, past the size cap, least
+recently used first. Losing the file only costs the cached completions.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import settings
+
+
+def cache_key(deployment: str, messages: List[Dict], params: Dict) -> bytes:
+    canonical = json.dumps({"deployment": deployment, "messages": messages, "params": params},
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=20).digest()
+
+
+class LLMCache:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS completions (
+            key BLOB PRIMARY KEY,
+            deployment TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_completions_last_used ON completions (last_used_at);
+    """
+
+    def __init__(self, path: str, ttl_hours: int, max_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.tokens_saved = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(self.SCHEMA)
+            self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        return self._db
+
+    def get(self, key: bytes) -> Optional[Dict]:
+        """Returns the cached completion for `key`, or None. Blocking."""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT response, size, tokens, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[3] < now - self.ttl_seconds:
+                db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                db.commit()
+                self._total_bytes -= row[1]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE completions SET last_used_at = ? WHERE key = ?", (now, key))
+            db.commit()
+        self.hits += 1
+        self.bytes_saved += row[1]
+        self.tokens_saved += row[2]
+        return json.loads(row[0])
+
+    def put(self, key: bytes, deployment: str, result: Dict):
+        """Stores a completion and evicts expired / least recently used entries past the size cap. Blocking."""
+        response = json.dumps(result, separators=(",", ":"))
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        tokens = (result.get("usage") or {}).get("total_tokens", 0)
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            with db:
+                previous = db.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO completions (key, deployment, response, size, tokens, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, deployment, response, size, tokens, now, now),
+                )
+                self._total_bytes += size - (previous[0] if previous else 0)
+                self._evict(db, now)
+
+    def _evict(self, db: sqlite3.Connection, now: float):
+        cutoff = now - self.ttl_seconds
+        expired = db.execute("SELECT COALESCE(SUM(size), 0) FROM completions WHERE created_at < ?", (cutoff,)).fetchone()[0]
+        if expired:
+            db.execute("DELETE FROM completions WHERE created_at < ?", (cutoff,))
+            self._total_bytes -= expired
+        if self._total_bytes <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in db.execute("SELECT key, size FROM completions ORDER BY last_used_at").fetchall():
+            if self._total_bytes <= self.max_bytes:
+                break
+            db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        logging.info(f"🧹 LLM cache over {self.max_bytes} bytes; evicted {evicted} least recently used entries.")
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "bytes_saved": self.bytes_saved,
+            "tokens_saved": self.tokens_saved,
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+llm_cache = LLMCache(
+    path=os.path.join(settings.LLM_CACHE_DIR, "llm_cache.sqlite3"),
+    ttl_hours=settings.LLM_CACHE_TTL_HOURS,
+    max_bytes=settings.LLM_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,212 @@
+# services/openai_gateway.py
+"""
+Single async entry point for Azure OpenAI chat completions.
+
+Every LLM call in the app (recommendations, askRabbit, policy analysis) goes
+through `openai_gateway`. It reuses the pooled "openai" HTTP client. The endpoint,
+deployments, API version and timeouts are configured in one place, and it keeps
+per-deployment latency and token counts for /metrics. Requests are admitted by
+services.rate_limiter and retried on 429 after the server's retry-after.
+Deterministic requests are answered from services.llm_cache when possible.
+`stream_chat` yields content deltas from the SSE stream for progressive replies.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+import httpx
+
+from config import settings
+from services.http_clients import http_clients
+from services.llm_cache import cache_key, llm_cache
+from services.rate_limiter import openai_rate_limiter, retry_after_seconds
+from services.tokens import count_chat_tokens, count_tokens
+
+Messages = Union[str, List[Dict[str, str]]]
+
+
+class OpenAIGateway:
+    def __init__(self, endpoint: str, api_key: str, default_deployment: str, api_version: str,
+                 timeout: float, connect_timeout: float, max_retries: int):
+        self.endpoint = endpoint.rstrip("/")
+        self.api_key = api_key
+        self.default_deployment = default_deployment
+        self.api_version = api_version
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self._stats = defaultdict(lambda: {
+            "calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_seconds": 0.0,
+        })
+
+    def url(self, deployment: Optional[str] = None) -> str:
+        return (f"{self.endpoint}/openai/deployments/{deployment or self.default_deployment}"
+                f"/chat/completions?api-version={self.api_version}")
+
+    def _prepare(self, messages: Messages, max_tokens: int, temperature: float, deployment: Optional[str],
+                 options: Dict):
+        deployment = deployment or self.default_deployment
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        payload = {"messages": messages, "max_tokens": max_tokens, "temperature": temperature, "n": 1, **options}
+        # Azure counts prompt + max_tokens against TPM when it admits the request
+        estimated = count_chat_tokens(messages) + max_tokens
+        return deployment, payload, estimated
+
+    async def _send(self, deployment: str, payload: Dict, estimated: int, stream: bool = False) -> httpx.Response:
+        """Posts through the rate limiter, retrying 429s. With `stream`, the body is left unread."""
+        stats = self._stats[deployment]
+        limiter = openai_rate_limiter.for_deployment(deployment)
+        client = http_clients.get("openai")
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire(estimated)
+            request = client.build_request(
+                "POST",
+                self.url(deployment),
+                headers={"Content-Type": "application/json", "api-key": self.api_key},
+                json=payload,
+                timeout=self.timeout,
+            )
+            response = await client.send(request, stream=stream)
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
+            await response.aclose()
+            delay = retry_after_seconds(response.headers) or min(2 ** attempt, 30) + random.random()
+            limiter.settle(estimated, 0, response.headers)  # A rejected request used none of its reservation
+            limiter.pause(delay)
+            stats["retries"] += 1
+            logging.warning(f"⏳ {deployment} throttled (429); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s.")
+        if response.is_error and stream:
+            await response.aread()  # So the caller's error handling can read the body
+            await response.aclose()
+        response.raise_for_status()
+        return response
+
+    def _record(self, deployment: str, estimated: int, prompt_tokens, completion_tokens, elapsed: float,
+                headers, streamed: bool = False):
+        stats = self._stats[deployment]
+        used = prompt_tokens + completion_tokens if isinstance(prompt_tokens, int) and isinstance(completion_tokens, int) else None
+        openai_rate_limiter.for_deployment(deployment).settle(estimated, used, headers)
+        stats["prompt_tokens"] += prompt_tokens if isinstance(prompt_tokens, int) else 0
+        stats["completion_tokens"] += completion_tokens if isinstance(completion_tokens, int) else 0
+        logging.info(
+            f"🤖 {deployment}: {elapsed * 1000:.0f} ms{' (streamed)' if streamed else ''}, "
+            f"{prompt_tokens if prompt_tokens is not None else '?'} prompt + "
+            f"{completion_tokens if completion_tokens is not None else '?'} completion tokens."
+        )
+
+    async def chat(self, messages: Messages, max_tokens: int = 400, temperature: float = 0.7,
+                   deployment: Optional[str] = None, cache: Optional[bool] = None, **options) -> Dict:
+        """
+        Sends one chat completion and returns the raw response JSON.
+        A plain string is sent as a single user message. Raises httpx.HTTPStatusError on API errors.
+
+        Responses are served from / stored in services.llm_cache when `cache` is True, or by
+        default when temperature is 0 (the only case where a repeat answer is expected anyway).
+        """
+        deployment, payload, estimated = self._prepare(messages, max_tokens, temperature, deployment, options)
+
+        key = None
+        if cache if cache is not None else temperature == 0:
+            key = cache_key(deployment, payload["messages"], {k: v for k, v in payload.items() if k != "messages"})
+            cached = await asyncio.to_thread(llm_cache.get, key)
+            if cached is not None:
+                logging.info(f"💾 {deployment}: served completion from cache.")
+                return cached
+
+        stats = self._stats[deployment]
+        stats["calls"] += 1
+        started = time.perf_counter()
+        try:
+            response = await self._send(deployment, payload, estimated)
+            result = response.json()
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats["latency_seconds"] += elapsed
+
+        usage = result.get("usage") or {}
+        self._record(deployment, estimated, usage.get("prompt_tokens"), usage.get("completion_tokens"), elapsed,
+                     response.headers)
+        if key is not None:
+            try:
+                await asyncio.to_thread(llm_cache.put, key, deployment, result)
+            except Exception as e:  # A cache write must never fail the call
+                logging.warning(f"⚠️ Could not cache {deployment} completion: {e}")
+        return result
+
+    async def stream_chat(self, messages: Messages, max_tokens: int = 400, temperature: float = 0.7,
+                          deployment: Optional[str] = None, **options) -> AsyncIterator[str]:
+        """
+        Streams one chat completion (Azure server-sent events), yielding content deltas as they arrive.
+        Streamed calls are rate limited like `chat` but never cached; completion tokens are counted locally.
+        """
+        deployment, payload, estimated = self._prepare(messages, max_tokens, temperature, deployment,
+                                                       {**options, "stream": True})
+        stats = self._stats[deployment]
+        stats["calls"] += 1
+        started = time.perf_counter()
+        first_delta = None
+        parts = []
+        try:
+            response = await self._send(deployment, payload, estimated, stream=True)
+            try:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    for choice in json.loads(data).get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            if first_delta is None:
+                                first_delta = time.perf_counter() - started
+                            parts.append(delta)
+                            yield delta
+            finally:
+                await response.aclose()
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats["latency_seconds"] += elapsed
+
+        if first_delta is not None:
+            logging.info(f"⚡ {deployment}: first streamed content after {first_delta * 1000:.0f} ms.")
+        self._record(deployment, estimated, count_chat_tokens(payload["messages"]), count_tokens("".join(parts)),
+                     elapsed, response.headers, streamed=True)
+
+    async def complete(self, messages: Messages, max_tokens: int = 400, temperature: float = 0.7,
+                       deployment: Optional[str] = None, cache: Optional[bool] = None, **options) -> str:
+        """Like `chat`, but returns just the first choice's stripped message text."""
+        result = await self.chat(messages, max_tokens, temperature, deployment, cache, **options)
+        return result["choices"][0]["message"]["content"].strip()
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {
+            deployment: {
+                **stats,
+                "latency_seconds": round(stats["latency_seconds"], 3),
+                "avg_latency_ms": round(stats["latency_seconds"] * 1000 / stats["calls"], 1) if stats["calls"] else None,
+            }
+            for deployment, stats in self._stats.items()
+        }
+
+
+openai_gateway = OpenAIGateway(
+    endpoint=settings.AZURE_OPENAI_ENDPOINT,
+    api_key=settings.AZURE_API_KEY,
+    default_deployment=settings.DEPLOYMENT_NAME,
+    api_version=settings.AZURE_OPENAI_API_VERSION,
+    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+    connect_timeout=settings.OPENAI_CONNECT_TIMEOUT_SECONDS,
+    max_retries=settings.OPENAI_MAX_RETRIES,
+)
@@ -0,0 +1,111 @@
+# services/pdf_extraction.py
+"""
+PDF text extraction off the event loop.
+
+pdfplumber is pure-Python and CPU bound, so documents are split into page
+ranges and parsed in a small process pool; the ranges' text is joined once at
+the end. Each document gets a page cap and a wall-clock timeout.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from config import settings
+from services import pdf_pages
+
+
+class PdfExtractionError(Exception):
+    """The PDF is too large, timed out or could not be parsed."""
+
+
+class PdfExtractor:
+    def __init__(self, workers: int, timeout: float, max_pages: int, pages_per_task: int):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.pages_per_task = max(1, pages_per_task)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: forking a process that runs an event loop and DB/HTTP threads can deadlock
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor, reason: str):
+        """
+        Kills the pool's workers (one is stuck on the timed-out document, or the pool is broken)
+        so the CPU is actually freed; new work gets a fresh pool. Other documents in flight on this pool fail too.
+        """
+        if self._pool is pool:
+            self._pool = None
+        # Private, but the executor offers no way to kill workers; if it goes away only shutdown() is left
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        logging.warning(f"📄 Killed {len(processes)} PDF extraction workers after {reason}.")
+
+    async def _extract(self, pool: ProcessPoolExecutor, path: str) -> str:
+        loop = asyncio.get_running_loop()
+        pages = await loop.run_in_executor(pool, pdf_pages.page_count, path)
+        if pages > self.max_pages:
+            raise PdfExtractionError(f"PDF has {pages} pages; the limit is {self.max_pages}.")
+
+        ranges = [(start, min(start + self.pages_per_task, pages)) for start in range(0, pages, self.pages_per_task)]
+        parts = await asyncio.gather(*(loop.run_in_executor(pool, pdf_pages.extract_pages, path, r) for r in ranges))
+        return "\n".join(page for part in parts for page in part)
+
+    async def extract_text(self, path: str) -> str:
+        """Returns the text of every page (one per line block, in order). Raises PdfExtractionError."""
+        started = time.monotonic()
+        try:
+            for attempt in range(2):
+                pool = self._get_pool()
+                try:
+                    text = await asyncio.wait_for(self._extract(pool, path), timeout=self.timeout)
+                    break
+                except BrokenProcessPool:
+                    # A worker died (OOM-killed, crashed on a bad PDF); the pool is unusable from now on
+                    await asyncio.to_thread(self._reset_pool, pool, "a worker died")
+                    if attempt:
+                        raise PdfExtractionError("PDF extraction worker died twice on this document.")
+                except asyncio.TimeoutError:
+                    await asyncio.to_thread(self._reset_pool, pool, "a timeout")
+                    raise PdfExtractionError(f"PDF text extraction timed out after {self.timeout:.0f}s.")
+        except PdfExtractionError:
+            raise
+        except Exception as e:
+            raise PdfExtractionError(f"Could not read PDF: {e}") from e
+        logging.info(f"📄 Extracted {len(text)} chars from {os.path.basename(path)} in {time.monotonic() - started:.2f}s.")
+        return text
+
+    def shutdown(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+            logging.info("📄 PDF extraction workers stopped.")
+
+
+pdf_extractor = PdfExtractor(
+    workers=settings.PDF_EXTRACT_WORKERS,
+    timeout=settings.PDF_EXTRACT_TIMEOUT_SECONDS,
+    max_pages=settings.PDF_MAX_PAGES,
+    pages_per_task=settings.PDF_PAGES_PER_TASK,
+)
+
+
+async def extract_pdf_text(path: str) -> str:
+    return await pdf_extractor.extract_text(path)
@@ -0,0 +1,27 @@
+# services/pdf_pages.py
+"""
+Page-range text extraction, run inside the PDF worker processes.
+
+Workers are spawned fresh and import only this module, so keep it free of
+app imports (config, DB engines, HTTP clients).
+"""
+
+from typing import List, Tuple
+
+import pdfplumber
+
+
+def page_count(path: str) -> int:
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pages(path: str, pages: Tuple[int, int]) -> List[str]:
+    """Text of pages [start, stop); image-only pages (no text layer) come back as ''."""
+    start, stop = pages
+    texts = []
+    with pdfplumber.open(path, pages=list(range(start + 1, stop + 1))) as pdf:
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.close()  # Drop the parsed layout before moving on; big pages hold a lot of objects
+    return texts
@@ -0,0 +1,161 @@
+# services/rate_limiter.py
+"""
+Client-side Azure OpenAI rate limiting, per deployment.
+
+Each deployment has a requests-per-minute and a tokens-per-minute bucket.
+Azure charges prompt tokens plus `max_tokens` against TPM when a request is
+admitted, so callers reserve that estimate up front and the bucket is settled
+with the real usage afterwards. Waiters are admitted in arrival order.
+
+429 responses pause the deployment for as long as the server asks
+(retry-after-ms / retry-after / x-ratelimit-reset-*).
+"""
+
+import asyncio
+import re
+import time
+from typing import Dict, Mapping, Optional
+
+from config import settings
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.level
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def clamp(self, remaining: float):
+        """Never believe we have more headroom than the server just reported."""
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class DeploymentLimiter:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm, rpm)
+        self.tokens = TokenBucket(tpm, tpm)
+        self._queue = asyncio.Lock()  # asyncio.Lock wakes waiters FIFO, which makes admission fair
+        self._paused_until = 0.0
+        self.waiting = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self, estimated_tokens: int):
+        """Waits until one request and `estimated_tokens` fit in the budget, then reserves them."""
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._queue:
+                while True:
+                    delay = max(
+                        self._paused_until - time.monotonic(),
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(estimated_tokens),
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self.requests.take(1)
+                self.tokens.take(estimated_tokens)
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+        self.wait_seconds += time.monotonic() - started
+
+    def settle(self, estimated_tokens: int, used_tokens: Optional[int], headers: Mapping[str, str]):
+        """Returns over-reserved tokens and syncs with the server's remaining-quota headers."""
+        if used_tokens is not None and used_tokens < estimated_tokens:
+            self.tokens.give_back(estimated_tokens - used_tokens)
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_requests and remaining_requests.isdigit():
+            self.requests.clamp(int(remaining_requests))
+        if remaining_tokens and remaining_tokens.isdigit():
+            self.tokens.clamp(int(remaining_tokens))
+
+    def pause(self, seconds: float):
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def metrics(self) -> Dict:
+        return {
+            "rpm_limit": self.requests.capacity,
+            "tpm_limit": self.tokens.capacity,
+            "requests_available": round(self.requests.available(), 1),
+            "tokens_available": round(self.tokens.available(), 1),
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "throttled_429": self.throttled,
+            "total_wait_seconds": round(self.wait_seconds, 3),
+            "paused_for_seconds": round(max(self._paused_until - time.monotonic(), 0), 3),
+        }
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Reads how long the server wants us to back off, if it said."""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+    resets = []
+    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(name)
+        if value:
+            seconds = sum(float(number) * _UNIT_SECONDS[unit] for number, unit in _DURATION.findall(value))
+            if seconds:
+                resets.append(seconds)
+    return max(resets) if resets else None
+
+
+class RateLimiter:
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._deployments: Dict[str, DeploymentLimiter] = {}
+
+    def for_deployment(self, deployment: str) -> DeploymentLimiter:
+        limiter = self._deployments.get(deployment)
+        if limiter is None:
+            limiter = self._deployments[deployment] = DeploymentLimiter(self.rpm, self.tpm)
+        return limiter
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {deployment: limiter.metrics() for deployment, limiter in self._deployments.items()}
+
+
+openai_rate_limiter = RateLimiter(rpm=settings.OPENAI_RPM_LIMIT, tpm=settings.OPENAI_TPM_LIMIT)
@@ -0,0 +1,93 @@
+# services/timestamps.py
+"""
+Shared timestamp parsing for ingest, ticket scoring and stats.
+
+Autotask emits ISO-8601 with a trailing 'Z' and 0–7 fractional digits
+("2025-03-04T15:02:11Z", "2025-03-04T15:02:11.1234567Z"). Use the column
+helpers for anything row-shaped; they parse a whole column in one pandas call.
+Naive inputs are treated as UTC everywhere.
+"""
+
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+from zoneinfo import ZoneInfo
+
+SLA_DISPLAY_FORMAT = "%m-%d-%y %-I:%M %p %Z"
+
+# Anything past microseconds is dropped; fromisoformat only takes up to 6 digits before Python 3.11
+_EXTRA_FRACTION = re.compile(r"(\.\d{6})\d+")
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str) -> ZoneInfo:
+    """ZoneInfo objects are cached process-wide instead of rebuilt per call."""
+    return ZoneInfo(name)
+
+
+CENTRAL_TZ = get_timezone("America/Chicago")
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Parses one ISO timestamp (or passes a datetime through) to an aware UTC datetime; None if invalid."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        if text.endswith(("Z", "z")):
+            text = text[:-1] + "+00:00"
+        text = _EXTRA_FRACTION.sub(r"\1", text)
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Drops the offset from a UTC datetime, matching what the SQL datetime columns store."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value is not None else None
+
+
+def parse_naive_utc(value) -> Optional[datetime]:
+    return to_naive_utc(parse_timestamp(value))
+
+
+def parse_timestamp_column(values: Iterable) -> pd.Series:
+    """Parses a whole column at once into datetime64[ns, UTC]; invalid or missing values become NaT."""
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    if series.empty:
+        return pd.Series([], dtype="datetime64[ns, UTC]")
+    parsed = pd.to_datetime(series, utc=True, errors="coerce", format="ISO8601")
+    # Drop digits past microseconds (7-digit Autotask fractions), as parse_timestamp does
+    return parsed.dt.floor("us")
+
+
+def column_to_naive_utc(column: pd.Series) -> List[Optional[datetime]]:
+    """Converts a parsed column back to naive-UTC Python datetimes (None for NaT) for DB writes."""
+    naive = column.dt.tz_convert("UTC").dt.tz_localize(None)
+    return [None if pd.isna(ts) else ts.to_pydatetime() for ts in naive]
+
+
+def parse_record_dates(records: Sequence[Dict], fields: Sequence[str]) -> Dict[str, List[Optional[datetime]]]:
+    """Column-parses `fields` across `records`, returning naive-UTC datetimes per field."""
+    return {
+        field: column_to_naive_utc(parse_timestamp_column(record.get(field) for record in records))
+        for field in fields
+    }
+
+
+def format_central(value: Optional[datetime], fmt: str = SLA_DISPLAY_FORMAT) -> Optional[str]:
+    """Formats a datetime in US Central time (naive values are treated as UTC)."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(CENTRAL_TZ).strftime(fmt)
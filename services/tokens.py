@@ -0,0 +1,103 @@
+# services/tokens.py
+"""
+Token counting for prompts sent to Azure OpenAI.
+
+Uses tiktoken's o200k_base encoding (GPT-4o family). tiktoken downloads the BPE
+file on first use and caches it under TIKTOKEN_CACHE_DIR (Settings, default
+/var/tmp/rabbitai/tiktoken); hosts without outbound access to
+openaipublic.blob.core.windows.net need it pre-fetched at image build time:
+
+    TIKTOKEN_CACHE_DIR=/var/tmp/rabbitai/tiktoken python -c "import tiktoken; tiktoken.get_encoding('o200k_base')"
+
+The app loads the encoding at startup. If it can't, counts fall back to the
+~4 characters per token estimate (logged as an error, shown under /metrics)
+and loading is retried every few minutes.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Union
+
+from config import settings
+
+os.environ.setdefault("TIKTOKEN_CACHE_DIR", settings.TIKTOKEN_CACHE_DIR)
+
+try:
+    import tiktoken
+except ImportError:  # Listed in requirements; without it every count is an estimate
+    tiktoken = None
+
+ENCODING_NAME = "o200k_base"  # GPT-4o family
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators per chat message
+RETRY_SECONDS = 300
+
+_lock = threading.Lock()
+_loaded = None
+_next_attempt = 0.0
+
+
+def _encoding():
+    global _loaded, _next_attempt
+    if _loaded is not None or tiktoken is None or time.monotonic() < _next_attempt:
+        return _loaded
+    with _lock:
+        if _loaded is None and time.monotonic() >= _next_attempt:
+            try:
+                _loaded = tiktoken.get_encoding(ENCODING_NAME)
+                logging.info(f"🔤 Loaded tiktoken encoding {ENCODING_NAME}.")
+            except Exception as e:  # The BPE file is fetched on first use and may be unreachable
+                _next_attempt = time.monotonic() + RETRY_SECONDS
+                logging.error(f"❌ tiktoken encoding {ENCODING_NAME} unavailable, estimating tokens from length "
+                              f"(retrying in {RETRY_SECONDS}s; pre-fetch it into TIKTOKEN_CACHE_DIR): {e}")
+    return _loaded
+
+
+def load_encoding() -> bool:
+    """Loads the encoding now (blocking; may download). True if exact counts are available."""
+    if tiktoken is None:
+        logging.error("❌ tiktoken is not installed; token counts are estimates.")
+        return False
+    return _encoding() is not None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Hard-splits text into windows of at most `max_tokens`, each repeating the last
+    `overlap_tokens` of the previous one. Cuts fall on token (or, estimating, character) boundaries.
+    """
+    encoding = _encoding()
+    if encoding is not None:
+        units = encoding.encode(text, disallowed_special=())
+        join = encoding.decode
+    else:
+        units = text
+        join = "".join
+        max_tokens, overlap_tokens = max_tokens * CHARS_PER_TOKEN, overlap_tokens * CHARS_PER_TOKEN
+    step = max(1, max_tokens - overlap_tokens)
+    windows = []
+    for start in range(0, len(units), step):
+        windows.append(join(units[start:start + max_tokens]))
+        if start + max_tokens >= len(units):
+            break
+    return windows
+
+
+def count_chat_tokens(messages: Union[str, List[Dict[str, str]]]) -> int:
+    """Prompt tokens for a chat request (a plain string counts as one user message)."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    return sum(count_tokens(str(message.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def tokenizer_metrics() -> Dict:
+    return {"encoding": ENCODING_NAME, "exact": _loaded is not None}
@@ -1,10 +1,13 @@
 import logging
-from datetime import datetime, timezone
+import time
 from typing import List
-from zoneinfo import ZoneInfo
 import httpx
 from fastapi import HTTPException
 from config import logger
+from services.http_clients import http_clients
+
+# Queues whose tickets never show up in a technician's list
+EXCLUDED_QUEUE_IDS = {29683506, 29683552, 29683546, 29683535}
 
 
 async def fetch_tickets_from_webhook(user_upn: str) -> List[dict]:
@@ -16,37 +19,36 @@ async def fetch_tickets_from_webhook(user_upn: str) -> List[dict]:
     logging.debug(f"[fetch_tickets_from_webhook] Request payload: {payload}")
 
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=300) as client:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
+        client = http_clients.get("rewst")
+        response = await client.post(url, json=payload, headers=headers, follow_redirects=True)
+        response.raise_for_status()
 
-            logging.debug(f"[fetch_tickets_from_webhook] Response Status: {response.status_code}")
-            logging.debug(f"[fetch_tickets_from_webhook] Response Body: {response.text}")
+        logging.debug(f"[fetch_tickets_from_webhook] Response Status: {response.status_code}")
+        logging.debug(f"[fetch_tickets_from_webhook] Response Body: {response.text}")
 
-            data = response.json()
+        data = response.json()
 
-            # Ensure response contains 'my_ticket'
-            if "my_ticket" not in data:
-                logging.error(f"[fetch_tickets_from_webhook] Missing 'my_ticket' key in response.")
-                logging.error(f"[fetch_tickets_from_webhook] Full Response: {data}")
-                raise ValueError("Malformed response: Missing 'my_ticket' key.")
+        # Ensure response contains 'my_ticket'
+        if "my_ticket" not in data:
+            logging.error(f"[fetch_tickets_from_webhook] Missing 'my_ticket' key in response.")
+            logging.error(f"[fetch_tickets_from_webhook] Full Response: {data}")
+            raise ValueError("Malformed response: Missing 'my_ticket' key.")
 
-            tickets = data.get("my_ticket", [])
-            if not isinstance(tickets, list):
-                logging.error(f"[fetch_tickets_from_webhook] Expected 'my_ticket' to be a list but got {type(tickets)}")
-                raise ValueError("Malformed response: 'my_ticket' is not a list.")
+        tickets = data.get("my_ticket", [])
+        if not isinstance(tickets, list):
+            logging.error(f"[fetch_tickets_from_webhook] Expected 'my_ticket' to be a list but got {type(tickets)}")
+            raise ValueError("Malformed response: 'my_ticket' is not a list.")
 
-            logging.info(f"[fetch_tickets_from_webhook] Retrieved {len(tickets)} tickets before filtering.")
+        logging.info(f"[fetch_tickets_from_webhook] Retrieved {len(tickets)} tickets before filtering.")
 
-            # Exclude tickets with specified queueIDs
-            excluded_queue_ids = {29683506, 29683552, 29683546, 29683535}
-            filtered_tickets = [
-                ticket for ticket in tickets if ticket.get("queueID") not in excluded_queue_ids
-            ]
+        # Exclude tickets with specified queueIDs
+        filtered_tickets = [
+            ticket for ticket in tickets if ticket.get("queueID") not in EXCLUDED_QUEUE_IDS
+        ]
 
-            logging.info(f"[fetch_tickets_from_webhook] {len(filtered_tickets)} tickets after filtering.")
+        logging.info(f"[fetch_tickets_from_webhook] {len(filtered_tickets)} tickets after filtering.")
 
-            return filtered_tickets
+        return filtered_tickets
 
     except httpx.HTTPStatusError as e:
         logging.error(f"[fetch_tickets_from_webhook] HTTP Error: {e.response.status_code} - {e.response.text}")
@@ -59,109 +61,6 @@ async def fetch_tickets_from_webhook(user_upn: str) -> List[dict]:
         raise HTTPException(status_code=500, detail="Unexpected error fetching tickets.")
 
 
-
-async def assign_ticket_weights(tickets: List[dict]) -> List[dict]:
-    logging.info(f"[assign_ticket_weights] Processing {len(tickets)} tickets for weight assignment.")
-
-    async def check_sla(met_date_str, due_date_str):
-        cst_tz = ZoneInfo('America/Chicago')
-
-        try:
-            # Parse due_date_str
-            due_date = datetime.fromisoformat(due_date_str.replace("Z", "+00:00")).astimezone(cst_tz) if due_date_str else None
-            met_date = datetime.fromisoformat(met_date_str.replace("Z", "+00:00")).astimezone(cst_tz) if met_date_str else None
-
-            logging.debug(f"[check_sla] due_date: {due_date}, met_date: {met_date}")
-
-        except ValueError as e:
-            logging.error(f"[check_sla] Invalid datetime format: {e}")
-            return False, None, "N/A", "Not completed"
-
-        sla_met = False
-        time_diff_seconds = None
-
-        if due_date:
-            if met_date:
-                sla_met = met_date <= due_date
-                time_diff_seconds = (due_date - met_date).total_seconds()
-            else:
-                sla_met = False
-                now = datetime.now(cst_tz)
-                time_diff_seconds = (due_date - now).total_seconds()
-        else:
-            logging.debug("[check_sla] Due date is None, returning N/A for SLA calculation.")
-            return False, None, "N/A", "Not completed"
-
-        return sla_met, time_diff_seconds, due_date.strftime("%m-%d-%y %-I:%M %p %Z") if due_date else "N/A", met_date.strftime("%m-%d-%y %-I:%M %p %Z") if met_date else "Not completed"
-
-    async def calculate_weight(ticket):
-        try:
-            weight = 0
-            ticket_id = ticket.get("id", "Unknown")
-            logging.debug(f"[calculate_weight] Calculating weight for Ticket ID: {ticket_id}")
-
-            priority = ticket.get("priority", "N/A")
-            status = ticket.get("status", "N/A")
-
-            priority_weights = {1: 5, 2: 4, 3: 3, 4: 2, 5: 1}
-            status_weights = {1: 50, 5: -10, 7: -20, 11: 70, 21: 60, 24: 65, 28: 55, 29: 60, 32: 0, 36: 65, 41: -20, 54: 60, 56: 60, 64: -20, 70: 70, 71: 70, 74: -20, 38: -400}
-
-            weight += priority_weights.get(priority, 0)
-            weight += status_weights.get(status, 10)
-
-            sla_fields = [("firstResponseDateTime", "firstResponseDueDateTime", "First Response"),
-                          ("resolutionPlanDateTime", "resolutionPlanDueDateTime", "Resolution Plan"),
-                          ("resolvedDateTime", "resolvedDueDateTime", "Resolution")]
-
-            for met_field, due_field, sla_name in sla_fields:
-                met_date_str = ticket.get(met_field)
-                due_date_str = ticket.get(due_field)
-                logging.debug(f"[calculate_weight] SLA Field {sla_name}: met_date={met_date_str}, due_date={due_date_str}")
-
-                sla_met, time_diff_seconds, due_date_formatted, met_date_formatted = await check_sla(met_date_str, due_date_str)
-                logging.debug(f"[calculate_weight] SLA {sla_name}: Met={sla_met}, Due={due_date_formatted}, Met={met_date_formatted}")
-
-                if not sla_met:
-                    weight += 100  # Penalize for unmet SLA
-
-            create_date_str = ticket.get("createDate")
-            if create_date_str:
-                try:
-                    create_date = datetime.fromisoformat(create_date_str.replace("Z", "+00:00"))
-                    days_since_creation = (datetime.now(timezone.utc) - create_date).days
-                    weight += days_since_creation * 10
-                    logging.debug(f"[calculate_weight] Ticket {ticket_id} Age: {days_since_creation} days, Final Weight: {weight}")
-                except ValueError:
-                    logging.error(f"[calculate_weight] Invalid createDate format: {create_date_str}")
-
-            return weight
-
-        except Exception as e:
-            logging.critical(f"[calculate_weight] Unexpected error for Ticket ID: {ticket_id} - {e}", exc_info=True)
-            return 0  # Default weight in case of failure
-
-    for ticket in tickets:
-        ticket["weight"] = await calculate_weight(ticket)
-
-    sorted_tickets = sorted(tickets, key=lambda t: t["weight"], reverse=True)
-    logging.info(f"[assign_ticket_weights] Top Ticket ID: {sorted_tickets[0]['id']} Weight: {sorted_tickets[0]['weight']}")
-    return sorted_tickets[:1]
-
-
-
-async def format_date(date_str):
-    cst_tz = ZoneInfo('America/Chicago')
-    if date_str:
-        try:
-            date_utc = datetime.fromisoformat(date_str.replace("Z", "+00:00")).astimezone(timezone.utc)
-            date_cst = date_utc.astimezone(cst_tz)
-            # Updated format string
-            return date_cst.strftime("%m-%d-%y %-I:%M %p %Z")
-        except ValueError:
-            return "Invalid Date"
-    return "N/A"
-
-
 async def construct_ticket_card(tickets: List[dict]) -> dict:
     async def get_priority_info(priority):
         priority_map = {
@@ -197,9 +96,8 @@ async def construct_ticket_card(tickets: List[dict]) -> dict:
         return status_map.get(status_id, f"Status ID {status_id}")
 
     async def format_timeline(rawticket):
-        """Format the timeline of SLAs"""
+        """Format the timeline of SLAs (evaluated during scoring; see ticket_scoring)"""
         timeline = []
-        cst_tz = ZoneInfo('America/Chicago')
         sla_results = rawticket.get("sla_results", [])
 
         logging.debug(f"🛠️ SLA Results for Ticket ID {rawticket.get('id')}: {sla_results}")
@@ -216,20 +114,21 @@ async def construct_ticket_card(tickets: List[dict]) -> dict:
                 "color": "attention"
             }]
 
+        now = time.time()
         for sla in sla_results:
             sla_name = sla.get("sla_name", "Unknown SLA")
             sla_met = sla.get("sla_met", False)
             due_date_formatted = sla.get("due_date_formatted", "N/A")
             met_date_formatted = sla.get("met_date_formatted", "Not completed")
             time_left_seconds = sla.get("time_left_seconds", None)
+            due_timestamp = sla.get("due_timestamp")
 
-            now = datetime.now(cst_tz)
             sla_status_text = "Not Met" if not sla_met else "Met"
             sla_status_color = "attention" if not sla_met else "good"
 
-            if met_date_formatted == "Not completed" and due_date_formatted != "N/A":
-                due_date = datetime.strptime(due_date_formatted, "%m-%d-%y %I:%M %p %Z").astimezone(cst_tz)
-                if due_date > now:
+            if met_date_formatted == "Not completed" and due_timestamp is not None:
+                time_left_seconds = due_timestamp - now  # Count down from render time, not from when the queue was scored
+                if time_left_seconds > 0:
                     sla_status_text = "Not Yet Due"
                     sla_status_color = "default"
 
@@ -269,12 +168,12 @@ async def construct_ticket_card(tickets: List[dict]) -> dict:
 
         return timeline
 
-    # Since we're only displaying one ticket, take the first one
+    # The top ticket gets the full card; any others are listed below it as "Up Next"
     ticket = tickets[0]
     priority_text, priority_color = await get_priority_info(ticket.get("priority"))
     status_text = await get_status_text(ticket.get("status"))
 
-    description = ticket.get("description", "")
+    description = ticket.get("description") or ""
     max_description_length = 200
     if len(description) > max_description_length:
         description = description[:max_description_length] + "..."
@@ -341,6 +240,41 @@ async def construct_ticket_card(tickets: List[dict]) -> dict:
         }
     ]
 
+    if len(tickets) > 1:
+        body.append({
+            "type": "TextBlock",
+            "text": "**Up Next:**",
+            "wrap": True,
+            "weight": "Bolder",
+            "spacing": "Large",
+            "size": "Medium"
+        })
+        for next_ticket in tickets[1:]:
+            next_priority_text, next_priority_color = await get_priority_info(next_ticket.get("priority"))
+            body.append({
+                "type": "Container",
+                "spacing": "Small",
+                "selectAction": {
+                    "type": "Action.OpenUrl",
+                    "url": f"https://ww15.autotask.net/Mvc/ServiceDesk/TicketDetail.mvc?workspace=False&ids%5B0%5D={next_ticket['id']}&ticketId={next_ticket['id']}"
+                },
+                "items": [
+                    {
+                        "type": "TextBlock",
+                        "text": f"**{next_ticket['id']}** · {next_ticket.get('title', 'Untitled')}",
+                        "wrap": True
+                    },
+                    {
+                        "type": "TextBlock",
+                        "text": f"{next_priority_text} · {await get_status_text(next_ticket.get('status'))} · {next_ticket.get('weight', 0)} pts",
+                        "wrap": True,
+                        "isSubtle": True,
+                        "spacing": "None",
+                        "color": next_priority_color
+                    }
+                ]
+            })
+
     adaptive_card = {
         "type": "AdaptiveCard",
         "version": "1.2",
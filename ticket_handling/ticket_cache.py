@@ -0,0 +1,133 @@
+# ticket_handling/ticket_cache.py
+"""
+Per-technician cache of open tickets in front of the (slow) ticket fetch.
+
+Entries younger than `ttl_seconds` are served as-is. Older entries are still
+served for up to `max_stale_seconds` while a refresh runs in the background
+(stale-while-revalidate); past that, callers wait for the refresh. Concurrent
+lookups for the same user share one upstream call. Listeners registered with
+`on_refresh` are told about every freshly fetched list.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from config import settings
+from ticket_handling.ticket_source import ticket_source
+
+TicketFetcher = Callable[[str], Awaitable[List[dict]]]
+RefreshListener = Callable[[str, List[dict]], None]
+
+
+class TicketCache:
+    def __init__(self, fetch: TicketFetcher, ttl_seconds: float, max_stale_seconds: float, max_users: int):
+        self.fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.max_users = max_users
+        self._entries: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._listeners: List[RefreshListener] = []
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    async def _load(self, user_upn: str) -> List[dict]:
+        started = time.monotonic()
+        try:
+            tickets = await self.fetch(user_upn)
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        self._entries[user_upn] = (time.monotonic(), tickets)
+        self._entries.move_to_end(user_upn)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+        self.refreshes += 1
+        logging.info(f"🎫 Refreshed {len(tickets)} tickets for {user_upn} in {time.monotonic() - started:.2f}s.")
+        for listener in self._listeners:
+            try:
+                listener(user_upn, tickets)
+            except Exception as e:
+                logging.error(f"❌ Ticket refresh listener failed for {user_upn}: {e}", exc_info=True)
+        return tickets
+
+    def on_refresh(self, listener: RefreshListener):
+        """Registers a callback run with (user_upn, tickets) after each successful fetch. It must not mutate the tickets."""
+        self._listeners.append(listener)
+
+    def refresh(self, user_upn: str) -> asyncio.Task:
+        """Starts a fetch for the user, or returns the one already in flight."""
+        task = self._inflight.get(user_upn)
+        if task is None:
+            task = self._inflight[user_upn] = asyncio.create_task(self._load(user_upn))
+            task.add_done_callback(lambda t: self._finish(user_upn, t))
+        return task
+
+    def _finish(self, user_upn: str, task: asyncio.Task):
+        if self._inflight.get(user_upn) is task:
+            del self._inflight[user_upn]
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"⚠️ Ticket refresh for {user_upn} failed: {task.exception()}")
+
+    async def get(self, user_upn: str) -> List[dict]:
+        """
+        Returns the user's tickets, from cache when possible. Each call gets its own
+        ticket dicts, so callers may annotate them (weights, SLA results) freely.
+        """
+        entry = self._entries.get(user_upn)
+        if entry is not None:
+            fetched_at, tickets = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl_seconds:
+                self.hits += 1
+                self._entries.move_to_end(user_upn)
+                return [dict(ticket) for ticket in tickets]
+            if age < self.max_stale_seconds:
+                self.stale_hits += 1
+                self._entries.move_to_end(user_upn)
+                self.refresh(user_upn)
+                return [dict(ticket) for ticket in tickets]
+
+        self.misses += 1
+        # Shielded so a client disconnect doesn't cancel the fetch other callers are waiting on
+        tickets = await asyncio.shield(self.refresh(user_upn))
+        return [dict(ticket) for ticket in tickets]
+
+    def revalidate(self, user_upn: str):
+        """Starts a background refresh if the user's list is missing or past its TTL."""
+        entry = self._entries.get(user_upn)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl_seconds:
+            self.refresh(user_upn)
+
+    def users(self) -> List[str]:
+        return list(self._entries)
+
+    def invalidate(self, user_upn: str):
+        self._entries.pop(user_upn, None)
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "users": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 3) if lookups else None,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "in_flight": len(self._inflight),
+        }
+
+
+ticket_cache = TicketCache(
+    ticket_source.fetch,
+    ttl_seconds=settings.TICKET_CACHE_TTL_SECONDS,
+    max_stale_seconds=settings.TICKET_CACHE_MAX_STALE_SECONDS,
+    max_users=settings.TICKET_CACHE_MAX_USERS,
+)
@@ -0,0 +1,137 @@
+# ticket_handling/ticket_queues.py
+"""
+Precomputed "next ticket" queues, one per active technician.
+
+Every time the ticket cache fetches a user's tickets, their queue is re-ranked
+if (and only if) the ticket data changed. A background worker periodically
+refreshes everyone who has asked for a ticket within `active_seconds` and
+re-scores unchanged queues so age-based weights keep moving. `getnextticket`
+then reads the head of a ready-made queue instead of waiting on the webhook.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from config import settings
+from ticket_handling.ticket_scoring import rank_tickets
+from ticket_handling.ticket_cache import TicketCache, ticket_cache
+
+
+class RankedQueue(NamedTuple):
+    signature: bytes
+    source: List[dict]   # The fetched tickets, as the cache returned them
+    tickets: List[dict]  # The top `depth`, highest weight first, with SLA results attached
+    computed_at: float
+
+
+class TicketQueues:
+    def __init__(self, cache: TicketCache, depth: int, refresh_seconds: float, active_seconds: float, concurrency: int):
+        self.cache = cache
+        self.depth = max(1, depth)
+        self.refresh_seconds = refresh_seconds
+        self.active_seconds = active_seconds
+        self.concurrency = max(1, concurrency)
+        self._queues: Dict[str, RankedQueue] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.rebuilds = 0
+        self.unchanged = 0
+        cache.on_refresh(self._on_refresh)
+
+    @staticmethod
+    def _signature(tickets: List[dict]) -> bytes:
+        encoded = json.dumps(tickets, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=16).digest()
+
+    def _rebuild(self, user_upn: str, tickets: List[dict], signature: bytes) -> RankedQueue:
+        ranked = rank_tickets([dict(ticket) for ticket in tickets], self.depth)
+        queue = self._queues[user_upn] = RankedQueue(signature, tickets, ranked, time.monotonic())
+        self.rebuilds += 1
+        return queue
+
+    def _on_refresh(self, user_upn: str, tickets: List[dict]):
+        if user_upn not in self._last_seen:
+            return  # Only technicians who use getnextticket get a queue (mytickets also fills the cache)
+        signature = self._signature(tickets)
+        queue = self._queues.get(user_upn)
+        if queue is not None and queue.signature == signature:
+            self.unchanged += 1
+            return
+        self._rebuild(user_upn, tickets, signature)
+
+    async def top(self, user_upn: str, n: int) -> List[dict]:
+        """The user's `n` (at most `depth`) highest-weighted tickets. Waits on the ticket fetch only the first time."""
+        self._last_seen[user_upn] = time.monotonic()
+        queue = self._queues.get(user_upn)
+        if queue is None:
+            tickets = await self.cache.get(user_upn)
+            queue = self._queues.get(user_upn) or self._rebuild(user_upn, tickets, self._signature(tickets))
+        else:
+            self.cache.revalidate(user_upn)  # Picks up changes in the background; this reply uses the current queue
+        return [dict(ticket) for ticket in queue.tickets[:n]]
+
+    # ----------------------------- background worker ------------------------
+    async def _refresh_user(self, user_upn: str, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                await asyncio.shield(self.cache.refresh(user_upn))
+            except Exception:
+                pass  # Logged by the cache; the previous queue stays in place
+
+    async def refresh_all(self):
+        started = time.monotonic()
+        active = [user for user, seen in self._last_seen.items() if started - seen < self.active_seconds]
+        for user in list(self._last_seen):
+            if user not in active:
+                del self._last_seen[user]
+        for user in list(self._queues):
+            if user not in self._last_seen:
+                del self._queues[user]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._refresh_user(user, semaphore) for user in active))
+
+        # Unchanged queues still need re-scoring: ticket age feeds into the weight
+        for user, queue in list(self._queues.items()):
+            if queue.computed_at < started:
+                self._rebuild(user, queue.source, queue.signature)
+        logging.info(f"🎫 Refreshed ticket queues for {len(active)} technicians in {time.monotonic() - started:.2f}s.")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh_all()
+            except Exception as e:
+                logging.critical(f"🔥 Ticket queue refresh failed: {e}", exc_info=True)
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def metrics(self) -> Dict:
+        return {
+            "queues": len(self._queues),
+            "active_users": len(self._last_seen),
+            "rebuilds": self.rebuilds,
+            "unchanged_refreshes": self.unchanged,
+        }
+
+
+ticket_queues = TicketQueues(
+    ticket_cache,
+    depth=settings.TICKET_QUEUE_TOP_N,
+    refresh_seconds=settings.TICKET_QUEUE_REFRESH_SECONDS,
+    active_seconds=settings.TICKET_QUEUE_ACTIVE_HOURS * 3600,
+    concurrency=settings.TICKET_QUEUE_REFRESH_CONCURRENCY,
+)
@@ -0,0 +1,155 @@
+# ticket_handling/ticket_scoring.py
+"""
+Columnar ticket weight scoring for next-ticket queues.
+
+weight = priority weight + status weight
+         + 100 for every SLA (first response, resolution plan, resolution) not met on time
+         + 10 per full day since the ticket was created
+
+Dates are parsed a column at a time and the arithmetic runs on NumPy arrays, so
+scoring thousands of tickets costs a handful of vectorized operations; only the
+top `limit` tickets are fully ordered (heapq.nlargest keeps ties in input order,
+like a stable sort).
+
+The same pass evaluates each SLA (met, due, time left) as columns too; the
+per-ticket ticket["sla_results"] dicts and display strings the ticket card
+needs are built only for the tickets rank_tickets returns.
+"""
+
+import heapq
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from services.timestamps import format_central, parse_timestamp_column
+
+PRIORITY_WEIGHTS = {1: 5, 2: 4, 3: 3, 4: 2, 5: 1}
+STATUS_WEIGHTS = {1: 50, 5: -10, 7: -20, 11: 70, 21: 60, 24: 65, 28: 55, 29: 60, 32: 0, 36: 65,
+                  41: -20, 54: 60, 56: 60, 64: -20, 70: 70, 71: 70, 74: -20, 38: -400}
+DEFAULT_STATUS_WEIGHT = 10
+UNMET_SLA_WEIGHT = 100
+WEIGHT_PER_DAY = 10
+
+# (met field, due field, display name)
+SLA_FIELDS = [("firstResponseDateTime", "firstResponseDueDateTime", "First Response"),
+              ("resolutionPlanDateTime", "resolutionPlanDueDateTime", "Resolution Plan"),
+              ("resolvedDateTime", "resolvedDueDateTime", "Resolution")]
+
+_NS_PER_DAY = 86_400 * 10**9
+
+
+def _lookup_table(weights: Dict[int, int], default: int) -> np.ndarray:
+    table = np.full(max(weights) + 1, default, dtype=np.int64)
+    for key, weight in weights.items():
+        table[key] = weight
+    return table
+
+
+_PRIORITY_TABLE = _lookup_table(PRIORITY_WEIGHTS, 0)
+_STATUS_TABLE = _lookup_table(STATUS_WEIGHTS, DEFAULT_STATUS_WEIGHT)
+
+
+def _table_weights(values: List, table: np.ndarray, default: int) -> np.ndarray:
+    """Maps ids through a lookup table; ids outside it (or not ints) get `default`."""
+    ids = np.fromiter((v if isinstance(v, int) else -1 for v in values), dtype=np.int64, count=len(values))
+    known = (ids >= 0) & (ids < len(table))
+    return np.where(known, table[np.where(known, ids, 0)], default)
+
+
+def _datetime_column(tickets: List[dict], field: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A date field as naive-UTC datetime64[ns] (NaT when missing or unparseable), plus a mask
+    of values that were present but unparseable.
+    """
+    raw = [ticket.get(field) for ticket in tickets]
+    parsed = parse_timestamp_column(raw).to_numpy(dtype="datetime64[ns]")
+    present = np.fromiter((value is not None and value != "" for value in raw), dtype=bool, count=len(raw))
+    return parsed, present & np.isnat(parsed)
+
+
+class SlaColumns(NamedTuple):
+    """One SLA evaluated for every ticket (arrays in input order)."""
+    name: str
+    met: np.ndarray          # datetime64[ns], NaT when missing or unparseable
+    due: np.ndarray          # datetime64[ns]
+    evaluable: np.ndarray    # Has a due date and no unparseable dates; otherwise shown as "N/A"
+    completed: np.ndarray
+    met_on_time: np.ndarray
+    time_left_seconds: np.ndarray  # due - met, or due - now while not completed
+
+
+def _evaluate(tickets: List[dict], now: Optional[datetime]) -> Tuple[np.ndarray, List[SlaColumns]]:
+    now = now or datetime.now(timezone.utc)
+    now64 = np.datetime64(now.astimezone(timezone.utc).replace(tzinfo=None), "ns")
+
+    weights = _table_weights([t.get("priority") for t in tickets], _PRIORITY_TABLE, 0)
+    weights += _table_weights([t.get("status") for t in tickets], _STATUS_TABLE, DEFAULT_STATUS_WEIGHT)
+
+    slas = []
+    for met_field, due_field, sla_name in SLA_FIELDS:
+        met, met_invalid = _datetime_column(tickets, met_field)
+        due, _ = _datetime_column(tickets, due_field)
+        evaluable = ~np.isnat(due) & ~met_invalid
+        completed = evaluable & ~np.isnat(met)
+        met_on_time = completed & (met <= due)
+        weights += np.where(met_on_time, 0, UNMET_SLA_WEIGHT)
+        time_left = np.where(completed, due - met, due - now64).astype("timedelta64[ns]").astype(np.int64) / 1e9
+        slas.append(SlaColumns(sla_name, met, due, evaluable, completed, met_on_time, time_left))
+
+    created, _ = _datetime_column(tickets, "createDate")
+    has_created = ~np.isnat(created)
+    age_ns = (now64 - np.where(has_created, created, now64)).astype(np.int64)
+    weights += np.where(has_created, np.floor_divide(age_ns, _NS_PER_DAY) * WEIGHT_PER_DAY, 0)
+    return weights, slas
+
+
+def _sla_results(slas: List[SlaColumns], i: int) -> List[Dict]:
+    """The ticket card's SLA entries for ticket `i`. Unevaluable SLAs (no due date, bad dates) read "N/A"."""
+    results = []
+    for sla in slas:
+        if not sla.evaluable[i]:
+            results.append({"sla_name": sla.name, "sla_met": False, "due_date_formatted": "N/A",
+                            "met_date_formatted": "Not completed", "time_left_seconds": None, "due_timestamp": None})
+            continue
+        due = sla.due[i].astype("datetime64[us]").item()  # Naive-UTC datetime
+        results.append({
+            "sla_name": sla.name,
+            "sla_met": bool(sla.met_on_time[i]),
+            "due_date_formatted": format_central(due),
+            "met_date_formatted": format_central(sla.met[i].astype("datetime64[us]").item()) if sla.completed[i] else "Not completed",
+            "time_left_seconds": float(sla.time_left_seconds[i]),
+            "due_timestamp": due.replace(tzinfo=timezone.utc).timestamp(),  # Lets open SLAs count down at render time
+        })
+    return results
+
+
+def score_tickets(tickets: List[dict], now: Optional[datetime] = None) -> np.ndarray:
+    """Returns every ticket's weight, in input order. `now` must be timezone-aware (default: current time)."""
+    if not tickets:
+        return np.zeros(0, dtype=np.int64)
+    return _evaluate(tickets, now)[0]
+
+
+def rank_tickets(tickets: List[dict], limit: Optional[int] = None, now: Optional[datetime] = None) -> List[dict]:
+    """
+    Sets each ticket's "weight" and returns the top `limit` (or all) highest first,
+    with "sla_results" attached to the returned tickets.
+    """
+    if not tickets:
+        return []
+    weights, slas = _evaluate(tickets, now)
+    weights = weights.tolist()
+    for ticket, weight in zip(tickets, weights):
+        ticket["weight"] = weight
+
+    k = len(tickets) if limit is None else min(limit, len(tickets))
+    top = heapq.nlargest(k, range(len(tickets)), key=weights.__getitem__)
+    ranked = []
+    for i in top:
+        tickets[i]["sla_results"] = _sla_results(slas, i)
+        ranked.append(tickets[i])
+    if ranked:
+        logging.info(f"[rank_tickets] Scored {len(tickets)} tickets; top ticket {ranked[0].get('id')} weight {ranked[0]['weight']}.")
+    return ranked
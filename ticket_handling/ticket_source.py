@@ -0,0 +1,122 @@
+# ticket_handling/ticket_source.py
+"""
+Where a technician's open tickets come from.
+
+- "webhook": the Rewst workflow (authoritative, but seconds per call).
+- "sql": dbo.tickets in the secondary DB, which the /process_tickets ingest keeps
+  current. Rows are looked up by assignedResourceID, so an index on
+  dbo.tickets(assignedResourceID) keeps this in the tens of milliseconds.
+
+The bot identifies users by their Teams/AAD id, not their Autotask resource, so
+the SQL source learns each user's resource id from webhook results. Users it
+hasn't seen yet, and any query that fails, go through the webhook instead.
+
+Pick one per deployment with the TICKET_SOURCE setting.
+"""
+
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text, bindparam
+
+from config import get_secondary_db_connection, settings
+from services.ingestion import TICKET_COLUMNS
+from ticket_handling.main_ticket_handler import EXCLUDED_QUEUE_IDS, fetch_tickets_from_webhook
+
+COMPLETED_STATUS = 5
+
+
+class WebhookTicketSource:
+    name = "webhook"
+
+    async def fetch(self, user_upn: str) -> List[dict]:
+        return await fetch_tickets_from_webhook(user_upn)
+
+    def metrics(self) -> Dict:
+        return {"source": self.name}
+
+
+class SqlTicketSource:
+    name = "sql"
+
+    QUERY = text(f"""
+        SELECT {", ".join(TICKET_COLUMNS)}
+        FROM dbo.tickets
+        WHERE assignedResourceID = :resource_id
+          AND status <> :completed_status
+          AND (queueID IS NULL OR queueID NOT IN :excluded_queue_ids)
+    """).bindparams(bindparam("excluded_queue_ids", expanding=True))
+
+    def __init__(self, fallback: WebhookTicketSource):
+        self.fallback = fallback
+        self._resource_ids: Dict[str, int] = {}
+        self.queries = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+    def _learn(self, user_upn: str, tickets: List[dict]):
+        """Remembers the resource most of the user's webhook tickets are assigned to."""
+        assigned = Counter(t.get("assignedResourceID") for t in tickets if t.get("assignedResourceID") is not None)
+        if assigned:
+            self._resource_ids[user_upn] = assigned.most_common(1)[0][0]
+
+    async def _fetch_webhook(self, user_upn: str) -> List[dict]:
+        self.fallbacks += 1
+        tickets = await self.fallback.fetch(user_upn)
+        self._learn(user_upn, tickets)
+        return tickets
+
+    async def _query(self, resource_id: int) -> List[dict]:
+        async with get_secondary_db_connection() as session:
+            result = await session.execute(self.QUERY, {
+                "resource_id": resource_id,
+                "completed_status": COMPLETED_STATUS,
+                "excluded_queue_ids": sorted(EXCLUDED_QUEUE_IDS),
+            })
+            rows = result.mappings().all()
+        # Same shape as the webhook's JSON: datetime columns are stored naive UTC
+        return [
+            {key: value.isoformat() + "Z" if isinstance(value, datetime) else value for key, value in row.items()}
+            for row in rows
+        ]
+
+    async def fetch(self, user_upn: str) -> List[dict]:
+        resource_id: Optional[int] = self._resource_ids.get(user_upn)
+        if resource_id is None:
+            logging.info(f"🎫 No resource id known for {user_upn} yet; fetching tickets from the webhook.")
+            return await self._fetch_webhook(user_upn)
+
+        started = time.monotonic()
+        try:
+            tickets = await self._query(resource_id)
+        except Exception as e:
+            self.failures += 1
+            logging.error(f"❌ Ticket query for resource {resource_id} failed, falling back to the webhook: {e}", exc_info=True)
+            return await self._fetch_webhook(user_upn)
+        self.queries += 1
+        logging.info(f"🎫 Loaded {len(tickets)} tickets for resource {resource_id} from SQL in {(time.monotonic() - started) * 1000:.0f} ms.")
+        return tickets
+
+    def metrics(self) -> Dict:
+        return {
+            "source": self.name,
+            "known_users": len(self._resource_ids),
+            "queries": self.queries,
+            "webhook_fallbacks": self.fallbacks,
+            "query_failures": self.failures,
+        }
+
+
+def build_ticket_source(name: str):
+    webhook = WebhookTicketSource()
+    if name == "sql":
+        return SqlTicketSource(fallback=webhook)
+    if name != "webhook":
+        logging.warning(f"⚠️ Unknown TICKET_SOURCE '{name}'; using the webhook.")
+    return webhook
+
+
+ticket_source = build_ticket_source(settings.TICKET_SOURCE)